@@ -1,10 +1,37 @@
+import argparse
+import sys
+
+from church.batch import run_file
 from church.cli import LambdaCmd
 
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m church",
+        description="Interpreter for untyped lambda calculus. "
+        "Starts an interactive session if no command is given.",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    run_parser = subparsers.add_parser(
+        "run",
+        help="run a script of interpreter commands non-interactively",
+    )
+    run_parser.add_argument(
+        "-j", "--jobs", type=int, default=None, metavar="N",
+        help="run eval commands in parallel in N worker processes "
+        "(0 for one per CPU)",
+    )
+    run_parser.add_argument("script", help="path to the script")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        return run_file(
+            args.script, sys.stdout, sys.stderr, jobs=args.jobs)
+
     cmd = LambdaCmd()
     cmd.cmdloop()
+    return 0
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""
+Non-interactive execution of lambda scripts.
+
+Scripts can be run sequentially, exactly as the interactive interpreter
+would run them, or in parallel: eval commands are independent of one
+another given the definitions before them, so in parallel mode they're
+farmed out to a pool of worker processes.  The environment is shipped to
+each worker once, as a session image, and each eval is sent as its
+source text together with the depth of the environment it refers to.
+"""
+import io
+import multiprocessing
+import os
+import time
+
+from church.ast import ParseError
+from church.cli import (
+    EVAL_OPTIONS,
+    format_result,
+    LambdaCmd,
+    OptionError,
+    parse_options,
+    stop_message,
+)
+from church.environment import UndefinedNameError
+from church.eval import Reduction, ReductionStats
+from church.expr import expr
+from church.image import dumps_image, loads_image
+from church.native import NATIVES
+from church.token import TokenError
+
+
+def run_script(lines, stdout, stderr, script_name="<script>", jobs=None):
+    """
+    Run the interpreter commands in a script.
+
+    Commands are read one at a time from lines (any iterable of strings,
+    such as an open file), with the same comment handling as the
+    interactive interpreter.  Results are written to stdout without
+    prompts; errors are written to stderr, and the first error stops the
+    script.  On completion, the total running time is reported to stderr.
+
+    If jobs is given, eval commands are run in parallel in that many
+    worker processes (or one per CPU, if jobs is 0).  Output is the same
+    as for a sequential run, except that a stopped evaluation can't be
+    resumed with continue.
+
+    Returns an exit status: 0 on success, 1 if a command failed.
+    """
+    start_time = time.perf_counter()
+    if jobs is not None:
+        commands, status = _run_parallel(
+            lines, stdout, stderr, script_name, jobs or os.cpu_count() or 1)
+        _report_time(stderr, commands, start_time)
+        return status
+
+    cmd = LambdaCmd(stdout=stdout, stderr=stderr)
+    commands = 0
+    status = 0
+    for line_number, line in enumerate(lines, start=1):
+        line = cmd.precmd(line)
+        if not line:
+            continue
+        commands += 1
+        cmd.last_error = None
+        stop = cmd.postcmd(cmd.onecmd(line), line)
+        if cmd.last_error is not None:
+            stderr.write("{}, line {}: {}\n".format(
+                script_name, line_number, line))
+            status = 1
+            break
+        if stop:
+            break
+
+    _report_time(stderr, commands, start_time)
+    return status
+
+
+def _report_time(stderr, commands, start_time):
+    stderr.write("Ran {} commands in {:.3f} seconds.\n".format(
+        commands, time.perf_counter() - start_time))
+
+
+def run_file(path, stdout, stderr, jobs=None):
+    """
+    Run the script in the file with the given path.
+
+    Returns an exit status, as for run_script.
+    """
+    try:
+        script_file = open(path, encoding="utf-8")
+    except OSError as e:
+        stderr.write("{}\n".format(e))
+        return 1
+    with script_file:
+        return run_script(
+            script_file, stdout, stderr, script_name=path, jobs=jobs)
+
+
+class _DeferringLambdaCmd(LambdaCmd):
+    """
+    Interpreter that checks eval commands, but records them as jobs for
+    the worker processes rather than running them.
+    """
+    def __init__(self, *args, **kwargs):
+        super(_DeferringLambdaCmd, self).__init__(*args, **kwargs)
+        self.job = None
+
+    def do_eval(self, arg):
+        try:
+            _, options, limits = self.parse_eval(arg)
+        except (OptionError, UndefinedNameError, ParseError, TokenError) as e:
+            self.report_error(e)
+            return
+        _, source = parse_options(arg, EVAL_OPTIONS)
+        self.job = (
+            self.environment.depth, source, "stats" in options, limits,
+            self.native,
+        )
+
+
+def _extends(env, base):
+    """
+    Return True if env is base with zero or more bindings appended.
+    """
+    while env.depth > base.depth:
+        env = env.pop()
+    return env is base
+
+
+def _run_parallel(lines, stdout, stderr, script_name, processes):
+    """
+    Run a script with eval commands distributed over worker processes.
+
+    Returns a pair (commands, status): the number of commands run and the
+    exit status.
+    """
+    cmd = _DeferringLambdaCmd()
+    commands = 0
+    # Commands run since the last flush: (location, output, errors, job).
+    pending = []
+    environment = cmd.environment
+    for line_number, line in enumerate(lines, start=1):
+        line = cmd.precmd(line)
+        if not line:
+            continue
+        commands += 1
+        cmd.stdout, cmd.stderr = io.StringIO(), io.StringIO()
+        cmd.last_error, cmd.job = None, None
+        stop = cmd.postcmd(cmd.onecmd(line), line)
+
+        if not _extends(cmd.environment, environment):
+            # The environment was replaced (for example by load-image), so
+            # the pending jobs need the old one shipping to the workers.
+            failed = _flush(pending, environment, stdout, stderr, processes)
+            if failed is not None:
+                return commands - len(pending) + failed, 1
+            pending = []
+        environment = cmd.environment
+
+        location = "{}, line {}: {}".format(script_name, line_number, line)
+        pending.append((location, cmd.stdout.getvalue(),
+                        cmd.stderr.getvalue(), cmd.job))
+        if cmd.last_error is not None or stop:
+            break
+
+    failed = _flush(pending, environment, stdout, stderr, processes)
+    if failed is not None:
+        return commands - len(pending) + failed, 1
+    return commands, 0
+
+
+def _flush(pending, environment, stdout, stderr, processes):
+    """
+    Run the jobs for pending commands, and write the output of all those
+    commands in order.
+
+    Returns the number of commands up to and including the first failed
+    command, or None if every command succeeded.
+    """
+    jobs = [job for _, _, _, job in pending if job is not None]
+    if not jobs:
+        job_results = iter([])
+        pool = None
+    else:
+        pool = multiprocessing.Pool(
+            min(processes, len(jobs)),
+            initializer=_initialize_worker,
+            initargs=(dumps_image(environment),),
+        )
+        chunk_size = max(1, len(jobs) // (4 * processes))
+        job_results = pool.imap(_run_job, jobs, chunk_size)
+
+    try:
+        for count, (location, output, errors, job) in enumerate(
+                pending, start=1):
+            if job is not None:
+                done, output = next(job_results)
+                if not done:
+                    output, errors = "", output
+            stdout.write(output)
+            if errors:
+                stderr.write(errors)
+                stderr.write("{}\n".format(location))
+                return count
+        return None
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+
+#: In a worker process, the environments at each depth of the shipped
+#: environment chain, outermost first.
+_worker_environments = None
+
+
+def _initialize_worker(image):
+    global _worker_environments
+    env = loads_image(image)
+    environments = [env]
+    while env:
+        env = env.pop()
+        environments.append(env)
+    environments.reverse()
+    _worker_environments = environments
+
+
+def _run_job(job):
+    """
+    Evaluate a term in a worker process.
+
+    Returns a pair (done, output): whether the reduction completed, and
+    either its formatted result or an error message.
+    """
+    depth, source, show_stats, limits, native = job
+    env = _worker_environments[depth]
+    term = expr(source, env, slots=True, natives=NATIVES if native else None)
+    stats = ReductionStats() if show_stats else None
+    reduction = Reduction(term, env, stats=stats)
+    if not reduction.run(**limits):
+        return False, "{}\n".format(stop_message(reduction))
+    return True, format_result(reduction, native)
@@ -1,21 +1,20 @@
 """
 To do:
 
-- catch KeyboardInterrupt while evaluating
 - show all?
-- show statistics
-- fix up exception handling; decorator?
 
 """
 import cmd
 
 from church.ast import ParseError
 from church.environment import (
+    indexed_environment,
     UndefinedNameError,
 )
 from church.eval import (
-    environment,
-    reduce,
+    NormalFormCache,
+    Reduction,
+    ReductionStats,
     Suspension,
 )
 from church.expr import (
@@ -24,29 +23,157 @@ from church.expr import (
     name,
     unexpr,
 )
+from church.image import (
+    dump_image,
+    ImageError,
+    load_image,
+)
+from church.native import (
+    NATIVES,
+    readback,
+)
 from church.token import (
     TokenError,
 )
 
 
+#: Options accepted by the eval command.
+EVAL_OPTIONS = {"stats", "fuel", "timeout"}
+
+
 INTRO_TEXT = """\
 Welcome to the interactive lambda calculus interpreter.
 Type 'help' to see supported commands.
 """
 
 
+class OptionError(Exception):
+    """
+    Exception raised for an invalid command option.
+    """
+    pass
+
+
+def parse_options(arg, allowed):
+    """
+    Split leading options of the form --name or --name=value off the
+    argument to a command.
+
+    Returns a pair (options, rest), where options is a dictionary
+    mapping option names to their values (True for options given
+    without a value), and rest is the remainder of the argument.
+    """
+    options = {}
+    arg = arg.strip()
+    while arg.startswith("--"):
+        option, *rest = arg.split(None, 1)
+        arg = rest[0] if rest else ""
+        option_name, equals, value = option[2:].partition("=")
+        if option_name not in allowed:
+            raise OptionError("Unknown option: --{}".format(option_name))
+        options[option_name] = value if equals else True
+    return options, arg
+
+
+def reduction_limits(options):
+    """
+    Extract the --fuel and --timeout limits from parsed options, as
+    keyword arguments for Reduction.run.
+    """
+    limits = {}
+    for option_name, option_type in [("fuel", int), ("timeout", float)]:
+        if option_name in options:
+            value = options[option_name]
+            try:
+                limits[option_name] = option_type(value)
+            except (TypeError, ValueError):
+                raise OptionError(
+                    "Invalid value for --{}: {}".format(option_name, value))
+    return limits
+
+
+def stop_message(reduction):
+    """
+    Describe why a reduction stopped before completion.
+    """
+    return "Reduction stopped after {} steps: {}.".format(
+        reduction.steps, reduction.stop_reason)
+
+
+def format_term(term, native=False):
+    """
+    Format a term in normal form for output, showing literals for
+    numerals, booleans, pairs and lists if native is true.
+    """
+    return readback(term) if native else unexpr(term)
+
+
+def format_result(reduction, native=False):
+    """
+    Format the normal form of a completed reduction for output, followed
+    by its statistics, if any.
+    """
+    lines = [format_term(reduction.result(), native)]
+    if reduction.stats is not None:
+        for stat_name, value in reduction.stats.as_dict().items():
+            lines.append("{}: {}".format(stat_name, value))
+    return "".join(line + "\n" for line in lines)
+
+
 class LambdaCmd(cmd.Cmd):
     prompt = "(church) "
 
     intro = INTRO_TEXT
 
-    def __init__(self, *args, **kwargs):
+    # Allow hyphenated command names, like load-image.
+    identchars = cmd.Cmd.identchars + "-"
+
+    def __init__(self, *args, stderr=None, **kwargs):
+        """
+        Takes the same arguments as cmd.Cmd, plus an optional stderr
+        stream for error messages; by default those go to stdout.
+        """
         super(LambdaCmd, self).__init__(*args, **kwargs)
-        self.environment = environment()
+        self.stderr = self.stdout if stderr is None else stderr
+        self.environment = indexed_environment()
+        # Most recent reduction stopped before completion, if any.
+        self.stopped_reduction = None
+        # Message for the most recent error, if any.
+        self.last_error = None
+        # Normal forms of recently evaluated terms.
+        self.cache = NormalFormCache()
+        # True if native numerals and booleans are enabled.
+        self.native = False
+
+    @property
+    def natives(self):
+        """
+        Native constants for binding, or None if they're disabled.
+        """
+        return NATIVES if self.native else None
+
+    def report_error(self, message):
+        """
+        Report a failed command.
+        """
+        self.last_error = str(message)
+        self.stderr.write("{}\n".format(message))
 
     def emptyline(self):
         pass
 
+    def default(self, line):
+        self.report_error("*** Unknown syntax: {}".format(line))
+
+    def parseline(self, line):
+        command, arg, line = super(LambdaCmd, self).parseline(line)
+        if command is not None:
+            command = command.replace("-", "_")
+        return command, arg, line
+
+    def do_help(self, arg):
+        return super(LambdaCmd, self).do_help(arg.replace("-", "_"))
+
     def precmd(self, line):
         # Strip off any comment.
         line, *_ = line.partition('#')
@@ -66,9 +193,10 @@ class LambdaCmd(cmd.Cmd):
         let four = add two two
         """
         try:
-            name, body = definition(arg, self.environment)
+            name, body = definition(
+                arg, self.environment, slots=True, natives=self.natives)
         except (UndefinedNameError, TokenError, ParseError) as e:
-            self.stdout.write("{}\n".format(e))
+            self.report_error(e)
             return
 
         self.environment = self.environment.append(
@@ -77,16 +205,141 @@ class LambdaCmd(cmd.Cmd):
         )
 
     def do_eval(self, arg):
-        r"""Evaluate a lambda term, reducing to normal form."""
+        r"""Evaluate a lambda term, reducing to normal form.
+
+        Options
+        -------
+        --stats
+            Also show statistics for the reduction.
+        --fuel=<steps>
+            Stop after the given number of reduction steps.
+        --timeout=<seconds>
+            Stop after the given time.
 
+        Normal forms are cached (see the cache command), so evaluating a
+        term again is fast; --stats always runs the reduction.
+
+        A reduction stopped by a limit or by Ctrl-C can be resumed with
+        the continue command.
+
+        Examples
+        --------
+        eval add two two
+        eval --stats add two two
+        eval --fuel=1000 --timeout=2.5 (\x.x x)(\x.x x)
+        """
         try:
-            term = expr(arg, self.environment)
-        except (UndefinedNameError, ParseError, TokenError) as e:
-            self.stdout.write("{}\n".format(e))
+            term, options, limits = self.parse_eval(arg)
+        except (OptionError, UndefinedNameError, ParseError, TokenError) as e:
+            self.report_error(e)
             return
 
-        result = reduce(term, self.environment)
-        self.stdout.write("{}\n".format(unexpr(result)))
+        if "stats" not in options:
+            normal_form = self.cache.get(term)
+            if normal_form is not None:
+                self.stopped_reduction = None
+                self.stdout.write("{}\n".format(
+                    format_term(normal_form, self.native)))
+                return
+
+        stats = ReductionStats() if "stats" in options else None
+        reduction = Reduction(term, self.environment, stats=stats)
+        self.run_reduction(reduction, limits)
+
+    def parse_eval(self, arg):
+        """
+        Parse the argument to the eval command.
+
+        Returns a triple (term, options, limits), where term is the term
+        to evaluate, bound in the current environment.
+        """
+        options, arg = parse_options(arg, EVAL_OPTIONS)
+        limits = reduction_limits(options)
+        term = expr(
+            arg, self.environment, slots=True, natives=self.natives)
+        return term, options, limits
+
+    def do_continue(self, arg):
+        r"""Resume the most recent evaluation stopped before completion.
+
+        Takes the same --fuel and --timeout options as eval.
+        """
+        try:
+            options, arg = parse_options(arg, {"fuel", "timeout"})
+            limits = reduction_limits(options)
+        except OptionError as e:
+            self.report_error(e)
+            return
+        if arg:
+            self.report_error("Usage: continue [--fuel=N] [--timeout=S]")
+            return
+        if self.stopped_reduction is None:
+            self.report_error("No stopped evaluation to continue.")
+            return
+
+        self.run_reduction(self.stopped_reduction, limits)
+
+    def run_reduction(self, reduction, limits):
+        """
+        Run a reduction subject to the given limits, and report on it.
+        """
+        if not reduction.run(interruptible=True, **limits):
+            self.stopped_reduction = reduction
+            self.report_error("{} Type 'continue' to resume.".format(
+                stop_message(reduction)))
+            return
+
+        self.stopped_reduction = None
+        self.cache.put(reduction.term, reduction.result())
+        self.stdout.write(format_result(reduction, self.native))
+
+    def do_native(self, arg):
+        r"""Turn native numerals and booleans on or off, or show the setting.
+
+        With native numerals on, let and eval accept integer literals,
+        true and false, and the primitives add, mul, pow, pred and
+        iszero (unless those names are defined), and arithmetic on
+        literals is done directly.  Results are shown with literals for
+        numerals, booleans, pairs (a, b) and lists [a, b, c].
+
+        Examples
+        --------
+        native on
+        eval pow 10 3
+        native off
+        """
+        if not arg:
+            self.stdout.write("{}\n".format("on" if self.native else "off"))
+        elif arg in {"on", "off"}:
+            self.native = arg == "on"
+        else:
+            self.report_error("Usage: native [on | off]")
+
+    def do_cache(self, arg):
+        r"""Show, resize or clear the cache of normal forms.
+
+        The cache keeps the normal forms of recently evaluated terms,
+        discarding the least recently used first. Terms that are equal up
+        to renaming of bound variables share an entry.
+
+        Examples
+        --------
+        cache
+        cache size 1000
+        cache clear
+        """
+        words = arg.split()
+        if not words:
+            cache = self.cache
+            self.stdout.write(
+                "size: {}\nmaxsize: {}\nhits: {}\nmisses: {}\n".format(
+                    len(cache), cache.maxsize, cache.hits, cache.misses))
+        elif words == ["clear"]:
+            self.cache.clear()
+        elif len(words) == 2 and words[0] == "size" and words[1].isdigit():
+            self.cache.resize(int(words[1]))
+        else:
+            self.report_error("Usage: cache [clear | size <entries>]")
 
     def do_show(self, arg):
         r"""Show the definition of a previously defined name."""
@@ -94,10 +347,10 @@ class LambdaCmd(cmd.Cmd):
         try:
             _, suspension = name(arg, self.environment)
         except (TokenError, ParseError):
-            self.stdout.write("Usage: show <identifier>\n")
+            self.report_error("Usage: show <identifier>")
             return
         except UndefinedNameError as e:
-            self.stdout.write("{}\n".format(e))
+            self.report_error(e)
             return
 
         replacements = {
@@ -106,3 +359,35 @@ class LambdaCmd(cmd.Cmd):
         }
         self.stdout.write("{}\n".format(unexpr(
             suspension.term, replacements)))
+
+    def do_save(self, arg):
+        r"""Save all current definitions to a binary image file.
+
+        Examples
+        --------
+        save prelude.img
+        """
+        if not arg:
+            self.report_error("Usage: save <file>")
+            return
+        try:
+            with open(arg, "wb") as image_file:
+                dump_image(self.environment, image_file)
+        except (ImageError, OSError) as e:
+            self.report_error(e)
+
+    def do_load_image(self, arg):
+        r"""Replace all current definitions with those from an image file.
+
+        Examples
+        --------
+        load-image prelude.img
+        """
+        if not arg:
+            self.report_error("Usage: load-image <file>")
+            return
+        try:
+            with open(arg, "rb") as image_file:
+                self.environment = load_image(image_file)
+        except (ImageError, OSError) as e:
+            self.report_error(e)
@@ -1,5 +1,6 @@
 # An environment represents a mapping to from Parameter instances to either
 # NameExpr instances or Suspension instances.
+from church.persistent import PersistentMap, PersistentVector
 
 
 class UndefinedNameError(Exception):
@@ -10,17 +11,25 @@ class UndefinedNameError(Exception):
 
 
 class Environment:
+    # The lookup methods below walk the linked frames at the top of the
+    # chain, and hand over to whatever environment lies beneath them
+    # (empty or indexed) once those frames are exhausted.
+
+    #: True for environments that are a single frame in a linked chain.
+    linked = False
+
     def lookup(self, var):
         """
         Look up a Parameter instance in the current environment.
 
         Returns either a NameExpr or a Suspension.
         """
-        while self:
-            if self.var == var:
-                return self.val
-            self = self.env
-        raise UndefinedNameError("Variable not in environment: {}".format(var))
+        env = self
+        while env.linked:
+            if env.var is var:
+                return env.val
+            env = env.env
+        return env.lookup(var)
 
     def lookup_by_name(self, name):
         """
@@ -29,11 +38,69 @@ class Environment:
 
         Returns a pair (binding, value).
         """
-        while self:
-            if self.var.name == name:
-                return self.var, self.val
-            self = self.env
-        raise UndefinedNameError("Undefined name: {}".format(name))
+        env = self
+        while env.linked:
+            if env.var.name == name:
+                return env.var, env.val
+            env = env.env
+        return env.lookup_by_name(name)
+
+    def lookup_slot(self, var, slot):
+        """
+        Look up a Parameter instance recorded at bind time as living in
+        the given slot (the environment depth at which it was bound).
+
+        Falls back to an ordinary lookup if the slot doesn't hold var,
+        so a term used in an environment other than the one it was
+        bound in still evaluates correctly.
+
+        Returns either a NameExpr or a Suspension.
+        """
+        env = self
+        while env.linked and env.depth > slot + 1:
+            env = env.env
+        if not env.linked:
+            return env.lookup_slot(var, slot)
+        if env.var is var:
+            return env.val
+        return self.lookup(var)
+
+    def lookup_slot_by_name(self, name):
+        """
+        Look up a name (a string) and recover the corresponding slot,
+        binding and value.
+
+        Returns a triple (slot, binding, value).
+        """
+        env = self
+        while env.linked:
+            if env.var.name == name:
+                return env.depth - 1, env.var, env.val
+            env = env.env
+        return env.lookup_slot_by_name(name)
+
+    def walk_length(self, var, slot=None):
+        """
+        Return the number of environment nodes visited when looking up
+        var, with lookup or (if slot is given) lookup_slot.
+
+        Used for reduction statistics.
+        """
+        env, length = self, 0
+        if slot is None:
+            while env.linked:
+                length += 1
+                if env.var is var:
+                    return length
+                env = env.env
+        else:
+            while env.linked and env.depth > slot + 1:
+                env, length = env.env, length + 1
+            if env.linked:
+                if env.var is var:
+                    return length + 1
+                return length + 1 + self.walk_length(var)
+        return length + env.walk_length(var, slot)
 
     def __iter__(self):
         while self:
@@ -43,16 +110,45 @@ class Environment:
     def append(self, var, val):
         return ChildEnvironment(var, val, self)
 
+    def extend(self, var, val):
+        """
+        Add a short-lived binding, such as a function argument during
+        reduction.
+
+        Like append, but an environment may choose a cheaper kind of
+        frame for the new binding than append would give.
+        """
+        return ChildEnvironment(var, val, self)
+
 
 class EmptyEnvironment(Environment):
+    depth = 0
+
     def __bool__(self):
         return False
 
+    def lookup(self, var):
+        raise UndefinedNameError("Variable not in environment: {}".format(var))
+
+    def lookup_by_name(self, name):
+        raise UndefinedNameError("Undefined name: {}".format(name))
+
+    def lookup_slot(self, var, slot):
+        return self.lookup(var)
+
+    def lookup_slot_by_name(self, name):
+        return self.lookup_by_name(name)
+
+    def walk_length(self, var, slot=None):
+        return 0
+
     def pop(self):
         raise ValueError("Cannot pop from empty environment")
 
 
 class ChildEnvironment(Environment):
+    linked = True
+
     def __init__(self, var, val, env):
         """
         Parameters
@@ -64,13 +160,144 @@ class ChildEnvironment(Environment):
         self.var = var
         self.val = val
         self.env = env
+        self.depth = env.depth + 1
+
+    def __bool__(self):
+        return True
+
+    def pop(self):
+        return self.env
+
+
+class IndexedEnvironment(Environment):
+    """
+    Environment with persistent indexes by Parameter, by name and by slot.
+
+    Has the same immutable append / pop semantics and shadowing rules as
+    the linked environment, but each lookup takes O(log n) time instead
+    of walking the whole chain; useful for long-lived environments
+    holding many definitions.  Each index maps to the environment node
+    holding the binding.
+
+    Bindings added with `extend` are cheaper `SlotEnvironment` frames,
+    which keep only the slot index; lookups by Parameter or name walk
+    those frames and then use the indexes for the rest of the chain.
+    """
+    def __init__(self, var=None, val=None, env=None):
+        """
+        Parameters
+        ----------
+        var : Parameter, optional
+        val : NameExpr or Suspension, optional
+        env : IndexedEnvironment, optional
+            Parent environment. If not given, creates an empty environment.
+        """
+        self.var = var
+        self.val = val
+        self.env = env
+        if env is None:
+            self._by_var = PersistentMap()
+            self._by_name = PersistentMap()
+            self._by_slot = PersistentVector()
+        else:
+            self._by_var = env._by_var.set(var, self)
+            self._by_name = env._by_name.set(var.name, self)
+            self._by_slot = env._by_slot.append(self)
+        self.depth = len(self._by_slot)
+
+    def __bool__(self):
+        return self.env is not None
+
+    def lookup(self, var):
+        node = self._by_var.get(var)
+        if node is None:
+            raise UndefinedNameError(
+                "Variable not in environment: {}".format(var))
+        return node.val
+
+    def lookup_by_name(self, name):
+        node = self._by_name.get(name)
+        if node is None:
+            raise UndefinedNameError("Undefined name: {}".format(name))
+        return node.var, node.val
+
+    def lookup_slot(self, var, slot):
+        if slot < self.depth:
+            node = self._by_slot[slot]
+            if node.var is var:
+                return node.val
+        return self.lookup(var)
+
+    def lookup_slot_by_name(self, name):
+        node = self._by_name.get(name)
+        if node is None:
+            raise UndefinedNameError("Undefined name: {}".format(name))
+        return node.depth - 1, node.var, node.val
+
+    def walk_length(self, var, slot=None):
+        # A single index probe.
+        return 1
+
+    def append(self, var, val):
+        return IndexedEnvironment(var, val, self)
+
+    def extend(self, var, val):
+        return SlotEnvironment(var, val, self)
+
+    def pop(self):
+        if self.env is None:
+            raise ValueError("Cannot pop from empty environment")
+        return self.env
+
+
+class SlotEnvironment(Environment):
+    """
+    Linked frame that also keeps a persistent vector of every binding in
+    the chain by slot, giving constant-time access to variables whose
+    slot was recorded at bind time.
+    """
+    linked = True
+
+    def __init__(self, var, val, env):
+        """
+        Parameters
+        ----------
+        var : Parameter
+        val : NameExpr or Suspension
+        env : SlotEnvironment or IndexedEnvironment
+        """
+        self.var = var
+        self.val = val
+        self.env = env
+        self._by_slot = env._by_slot.append(self)
+        self.depth = env.depth + 1
 
     def __bool__(self):
         return True
 
+    def lookup_slot(self, var, slot):
+        if slot < self.depth:
+            node = self._by_slot[slot]
+            if node.var is var:
+                return node.val
+        return self.lookup(var)
+
+    def walk_length(self, var, slot=None):
+        if slot is not None and slot < self.depth:
+            if self._by_slot[slot].var is var:
+                return 1
+        return Environment.walk_length(self, var)
+
+    def append(self, var, val):
+        return SlotEnvironment(var, val, self)
+
+    def extend(self, var, val):
+        return SlotEnvironment(var, val, self)
+
     def pop(self):
         return self.env
 
 
-# Constructor function.
+# Constructor functions.
 environment = EmptyEnvironment
+indexed_environment = IndexedEnvironment
@@ -1,10 +1,17 @@
 """
 Evaluation strategies for lambda expressions.
 """
+import collections
+import signal
+import threading
+import time
+
 from church.expr import (
-    ApplyExpr, FunctionExpr, NameExpr, Parameter,
+    ApplyExpr, ConstantExpr, DEFAULT_BUILDER, FunctionExpr, NameExpr,
+    Parameter,
 )
 from church.environment import environment
+from church.native import church_term
 
 
 # Normal order reduction: translated from section 4.2 of the paper "An
@@ -14,6 +21,13 @@ from church.environment import environment
 # should be normalised in.
 
 class Suspension:
+    # Call-by-need bookkeeping, filled in by a lazy reduction the first
+    # time the suspension is forced: its weak head normal form (either a
+    # Suspension with a FunctionExpr term, or a neutral term already in
+    # normal form) and its full normal form.
+    whnf = None
+    normal_form = None
+
     def __init__(self, term, env):
         self.term = term
         self.env = env
@@ -25,60 +39,486 @@ def apply(func, arg):
     """
     return Suspension(
         func.term.body,
-        func.env.append(func.term.parameter, arg),
+        func.env.extend(func.term.parameter, arg),
     )
 
 
-def reduce(term, env=environment()):
+class NativeApplication:
     """
-    Reduce the given term to its normal form, if that normal form exists.
+    A primitive operation applied to too few arguments (suspensions) for
+    its delta rule to fire.  Such applications are in weak head normal
+    form.
+    """
+    def __init__(self, primitive, arguments):
+        self.primitive = primitive
+        self.arguments = arguments
+
+
+def _apply_native(function, arg, action, to_do, results, stats):
+    """
+    Apply a native constant or NativeApplication to the suspension arg,
+    and continue with action 0 or 1.
+    """
+    if type(function) == NativeApplication:
+        primitive, arguments = function.primitive, function.arguments
+    elif type(function.value) in (bool, int):
+        # Numerals and booleans used as functions act as their Church
+        # encodings.  Those are closed, so need no environment.
+        if stats is not None:
+            stats.beta_steps += 1
+            stats.suspensions += 2
+        encoding = Suspension(church_term(function.value), environment())
+        to_do.append((action, apply(encoding, arg)))
+        return
+    else:
+        primitive, arguments = function.value, ()
+
+    arguments += (arg,)
+    if len(arguments) == primitive.arity:
+        # Reduce the arguments to weak head normal form, then apply the
+        # delta rule.
+        to_do.append((9, (action, primitive, arguments)))
+        to_do.extend((1, argument) for argument in reversed(arguments))
+    elif action == 1:
+        results.append(NativeApplication(primitive, arguments))
+    else:
+        _normalise_native(NativeApplication(primitive, arguments), to_do)
+
+
+def _normalise_native(application, to_do):
+    """
+    Normalise a NativeApplication, by normalising its arguments.
+    """
+    for argument in reversed(application.arguments):
+        to_do.extend([(4, None), (0, argument)])
+    to_do.append((10, application.primitive))
+
+
+class ReductionStats:
+    """
+    Counters describing the work done by a single reduction.
+
+    Pass an instance to reduce to have it filled in.
+    """
+    def __init__(self):
+        #: Number of steps taken by the reduction machine.
+        self.steps = 0
+        #: Number of calls to apply (beta steps, including the
+        #: substitution of fresh variables when normalising under a
+        #: lambda).
+        self.beta_steps = 0
+        #: Number of variable lookups in the environment.
+        self.lookups = 0
+        #: Total and maximum number of environment nodes visited by those
+        #: lookups.
+        self.chain_walk = 0
+        self.max_chain_walk = 0
+        #: Number of suspensions created.
+        self.suspensions = 0
+        #: Peak sizes of the to_do and results stacks.
+        self.max_to_do = 0
+        self.max_results = 0
+
+    def as_dict(self):
+        """
+        Return the counters as a dictionary, in display order.
+        """
+        return collections.OrderedDict([
+            ("steps", self.steps),
+            ("beta_steps", self.beta_steps),
+            ("lookups", self.lookups),
+            ("chain_walk", self.chain_walk),
+            ("max_chain_walk", self.max_chain_walk),
+            ("suspensions", self.suspensions),
+            ("max_to_do", self.max_to_do),
+            ("max_results", self.max_results),
+        ])
+
+
+# Actions used by the reduction machine:
+#
+# 0: normalise the suspension arg
+# 1: reduce the suspension arg to weak head normal form
+# 2, 3: apply the result on top of the results stack to the suspension arg,
+#       then continue with action 0 or 1 respectively
+# 4: combine the top two results into an application
+# 5: combine the top two results into a function
+# 6: record the result on top of the stack as the whnf of suspension arg
+# 7: record the result on top of the stack as the normal form of arg
+# 8: normalise the weak head normal form on top of the results stack
+# 9: apply the delta rule for a primitive whose arguments, reduced to
+#    weak head normal form, are on top of the results stack
+# 10: push the constant for the primitive arg onto the results stack
+
+
+#: Number of machine steps between checks of the deadline and of
+#: keyboard interrupts.
+CHECK_INTERVAL = 1000
+
+#: Reasons for a reduction stopping before completion.
+FUEL_EXHAUSTED = "step budget exhausted"
+TIMED_OUT = "deadline reached"
+INTERRUPTED = "keyboard interrupt"
+
+
+class ReductionInterrupted(Exception):
     """
-    to_do = [(0, Suspension(term, env))]
-    results = []
+    Exception raised by reduce when a reduction stops before completing.
+
+    The reduction attribute holds the Reduction instance, which can be
+    resumed with its run method.
+    """
+    def __init__(self, reduction):
+        super(ReductionInterrupted, self).__init__(
+            "Reduction stopped after {} steps: {}".format(
+                reduction.steps, reduction.stop_reason))
+        self.reduction = reduction
+
+
+class Reduction:
+    """
+    A normal-order reduction in progress.
+
+    Holds the complete state of the reduction machine, so that a
+    reduction stopped by a step budget, a deadline or a keyboard
+    interrupt can be resumed later without starting again.
 
-    while to_do:
-        action, arg = to_do.pop()
-        if action < 2:
-            term, lexenv = arg.term, arg.env
-            if type(term) == NameExpr:
-                susp = lexenv.lookup(term.parameter)
+    See reduce for a description of the lazy, stats and builder arguments.
+    """
+    def __init__(self, term, env=environment(), lazy=False, stats=None,
+                 builder=DEFAULT_BUILDER):
+        #: The term being reduced.
+        self.term = term
+        self.to_do = [(0, Suspension(term, env))]
+        self.results = []
+        self.lazy = lazy
+        self.stats = stats
+        self.builder = builder
+        #: Total number of machine steps taken so far.
+        self.steps = 0
+        #: Reason the last call to run stopped early, or None.
+        self.stop_reason = None
+        if stats is not None:
+            stats.suspensions += 1
+
+    @property
+    def done(self):
+        """
+        True if the reduction has reached normal form.
+        """
+        return not self.to_do
+
+    def result(self):
+        """
+        Return the normal form of a completed reduction.
+        """
+        if self.to_do:
+            raise ValueError("Reduction is not complete.")
+        result, = self.results
+        return result
+
+    def run(self, fuel=None, timeout=None, interruptible=False):
+        """
+        Continue the reduction.
+
+        Parameters
+        ----------
+        fuel : int, optional
+            Maximum number of machine steps to take.
+        timeout : float, optional
+            Maximum time to run for, in seconds.
+        interruptible : bool, optional
+            If true, a keyboard interrupt (SIGINT) stops the reduction
+            cleanly, leaving it in a resumable state.  Only effective
+            when called from the main thread.
+
+        Returns
+        -------
+        done : bool
+            True if the reduction is complete, False if it stopped
+            early; in that case stop_reason gives the reason.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        interrupts = []
+
+        previous_handler = None
+        if (interruptible and
+                threading.current_thread() is threading.main_thread()):
+            previous_handler = signal.signal(
+                signal.SIGINT, lambda signum, frame: interrupts.append(signum))
+
+        self.stop_reason = None
+        try:
+            while self.to_do:
+                if fuel is None:
+                    limit = CHECK_INTERVAL
+                elif fuel > 0:
+                    limit = min(fuel, CHECK_INTERVAL)
+                else:
+                    self.stop_reason = FUEL_EXHAUSTED
+                    break
+
+                steps = self._run_steps(limit)
+                self.steps += steps
+                if self.stats is not None:
+                    self.stats.steps += steps
+                if fuel is not None:
+                    fuel -= steps
+
+                if interrupts:
+                    self.stop_reason = INTERRUPTED
+                    break
+                if deadline is not None and time.monotonic() >= deadline:
+                    self.stop_reason = TIMED_OUT
+                    break
+        finally:
+            if previous_handler is not None:
+                signal.signal(signal.SIGINT, previous_handler)
+
+        return not self.to_do
+
+    def _run_steps(self, limit):
+        """
+        Take up to limit steps of the reduction machine, returning the
+        number of steps actually taken.
+        """
+        to_do, results = self.to_do, self.results
+        lazy, stats = self.lazy, self.stats
+        if self.builder is DEFAULT_BUILDER:
+            make_apply, make_function = ApplyExpr, FunctionExpr
+            make_name, make_constant = NameExpr, ConstantExpr
+        else:
+            make_apply = self.builder.apply
+            make_function = self.builder.function
+            make_name = self.builder.name
+            make_constant = self.builder.constant
+        remaining = limit
+
+        while to_do and remaining:
+            remaining -= 1
+            if stats is not None:
+                stats.max_to_do = max(stats.max_to_do, len(to_do))
+                stats.max_results = max(stats.max_results, len(results))
+
+            action, arg = to_do.pop()
+            if action < 2:
+                term, lexenv = arg.term, arg.env
+                if type(term) == NameExpr:
+                    if stats is not None:
+                        walk = lexenv.walk_length(term.parameter, term.slot)
+                        stats.lookups += 1
+                        stats.chain_walk += walk
+                        stats.max_chain_walk = max(stats.max_chain_walk, walk)
+                    if term.slot is None:
+                        susp = lexenv.lookup(term.parameter)
+                    else:
+                        susp = lexenv.lookup_slot(term.parameter, term.slot)
+                    if type(susp) != Suspension:
+                        assert type(susp) == NameExpr
+                        results.append(susp)
+                    elif not lazy:
+                        to_do.append((action, susp))
+                    elif susp.whnf is None:
+                        if action == 0:
+                            to_do.extend([(7, susp), (8, None)])
+                        to_do.extend([(6, susp), (1, susp)])
+                    elif action == 1 or (
+                            type(susp.whnf) != Suspension and
+                            type(susp.whnf) != NativeApplication):
+                        results.append(susp.whnf)
+                    elif susp.normal_form is not None:
+                        results.append(susp.normal_form)
+                    elif type(susp.whnf) == Suspension:
+                        to_do.extend([(7, susp), (0, susp.whnf)])
+                    else:
+                        to_do.append((7, susp))
+                        _normalise_native(susp.whnf, to_do)
+                elif type(term) == ApplyExpr:
+                    if stats is not None:
+                        stats.suspensions += 2
+                    to_do.extend([
+                        (action+2, Suspension(term.argument, lexenv)),
+                        (1, Suspension(term.function, lexenv)),
+                    ])
+                elif type(term) == ConstantExpr:
+                    results.append(term)
+                else:
+                    assert type(term) == FunctionExpr
+                    if action == 1:
+                        results.append(arg)
+                    else:
+                        if stats is not None:
+                            stats.beta_steps += 1
+                            stats.suspensions += 1
+                        newvar = Parameter(term.parameter.name)
+                        results.append(newvar)
+                        to_do.extend(
+                            [(5, None), (0, apply(arg, make_name(newvar)))]
+                        )
+
+            elif action < 4:
+                susp = results.pop()
                 if type(susp) == Suspension:
-                    to_do.append((action, susp))
+                    if stats is not None:
+                        stats.beta_steps += 1
+                        stats.suspensions += 1
+                    to_do.append((action-2, apply(susp, arg)))
+                elif (type(susp) == ConstantExpr or
+                        type(susp) == NativeApplication):
+                    _apply_native(susp, arg, action-2, to_do, results, stats)
                 else:
-                    assert type(susp) == NameExpr
                     results.append(susp)
-            elif type(term) == ApplyExpr:
-                to_do.extend([
-                    (action+2, Suspension(term.argument, lexenv)),
-                    (1, Suspension(term.function, lexenv)),
-                ])
-            else:
-                assert type(term) == FunctionExpr
-                if action == 1:
-                    results.append(arg)
+                    to_do.extend([(4, None), (0, arg)])
+
+            elif action == 4:
+                argument, function = results.pop(), results.pop()
+                results.append(make_apply(function, argument))
+
+            elif action == 5:
+                body, newvar = results.pop(), results.pop()
+                results.append(make_function(newvar, body))
+
+            elif action == 6:
+                arg.whnf = results[-1]
+
+            elif action == 7:
+                arg.normal_form = results[-1]
+
+            elif action == 8:
+                whnf = results.pop()
+                if type(whnf) == Suspension:
+                    to_do.append((0, whnf))
+                elif type(whnf) == NativeApplication:
+                    _normalise_native(whnf, to_do)
                 else:
-                    newvar = Parameter(term.parameter.name)
-                    results.append(newvar)
-                    to_do.extend(
-                        [(5, None), (0, apply(arg, NameExpr(newvar)))]
-                    )
-
-        elif action < 4:
-            susp = results.pop()
-            if type(susp) == Suspension:
-                to_do.append((action-2, apply(susp, arg)))
+                    # Neutral terms are already fully normalised.
+                    results.append(whnf)
+
+            elif action == 9:
+                action, primitive, arguments = arg
+                values = results[len(results) - len(arguments):]
+                del results[len(results) - len(arguments):]
+                value = primitive.evaluate(values)
+                if value is not None:
+                    results.append(make_constant(value))
+                else:
+                    # Some arguments aren't native constants: fall back to
+                    # the lambda term the primitive stands for.
+                    if stats is not None:
+                        stats.beta_steps += len(arguments)
+                        stats.suspensions += len(arguments) + 1
+                    susp = Suspension(primitive.definition, environment())
+                    for argument in arguments:
+                        susp = apply(susp, argument)
+                    to_do.append((action, susp))
+
             else:
-                results.append(susp)
-                to_do.extend([(4, None), (0, arg)])
+                assert action == 10
+                results.append(make_constant(arg))
 
-        elif action == 4:
-            argument, function = results.pop(), results.pop()
-            results.append(ApplyExpr(function, argument))
+        return limit - remaining
 
-        else:
-            assert action == 5
-            body, newvar = results.pop(), results.pop()
-            results.append(FunctionExpr(newvar, body))
 
-    result, = results
-    return result
+def reduce(term, env=environment(), lazy=False, stats=None,
+           builder=DEFAULT_BUILDER, fuel=None, timeout=None,
+           interruptible=False):
+    """
+    Reduce the given term to its normal form, if that normal form exists.
+
+    If lazy is true, use call-by-need: the first time a suspension
+    bound in an environment is forced, its weak head normal form (and
+    later its normal form) is written back into the suspension and
+    shared by every other reference to it.
+
+    If stats is given, it should be a ReductionStats instance; its
+    counters are updated as the reduction proceeds.
+
+    Nodes of the normal form are created with the given ExprBuilder;
+    pass a HashConsingBuilder to share repeated subterms.
+
+    The fuel, timeout and interruptible arguments limit the reduction as
+    described in Reduction.run.  If a limit is hit, ReductionInterrupted
+    is raised; its reduction attribute can be used to continue.
+    """
+    reduction = Reduction(term, env, lazy=lazy, stats=stats, builder=builder)
+    if not reduction.run(
+            fuel=fuel, timeout=timeout, interruptible=interruptible):
+        raise ReductionInterrupted(reduction)
+    return reduction.result()
+
+
+class NormalFormCache:
+    """
+    Bounded cache of normal forms, with least-recently-used eviction.
+
+    Terms are used as keys directly: Expr hashing and equality are
+    alpha-invariant, so alpha-equivalent terms share an entry.  Free
+    names in a term are compared by Parameter, and each Parameter is only
+    ever bound to one value, so a term's normal form doesn't depend on
+    the environment it's looked up from.
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        Maximum number of normal forms to keep. Zero disables caching.
+    """
+    def __init__(self, maxsize=128):
+        self._entries = collections.OrderedDict()
+        self.maxsize = maxsize
+        #: Number of lookups that found, and failed to find, a cached
+        #: normal form.
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, term):
+        """
+        Return the cached normal form of term, or None if there isn't one.
+        """
+        try:
+            normal_form = self._entries[term]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(term)
+        self.hits += 1
+        return normal_form
+
+    def put(self, term, normal_form):
+        """
+        Record the normal form of a term, evicting the least recently used
+        entries if the cache is full.
+        """
+        self._entries[term] = normal_form
+        self._entries.move_to_end(term)
+        self._evict()
+
+    def resize(self, maxsize):
+        """
+        Change the maximum size of the cache.
+        """
+        self.maxsize = maxsize
+        self._evict()
+
+    def clear(self):
+        """
+        Discard all entries, and reset the hit and miss counters.
+        """
+        self._entries.clear()
+        self.hits = self.misses = 0
+
+    def reduce(self, term, env=environment(), **kwargs):
+        """
+        Reduce a term to normal form, as for reduce, using the cache.
+        """
+        normal_form = self.get(term)
+        if normal_form is None:
+            normal_form = reduce(term, env, **kwargs)
+            self.put(term, normal_form)
+        return normal_form
+
+    def _evict(self):
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
@@ -2,6 +2,7 @@
 Lambda expressions, complete with bindings from names to binding points.
 """
 import itertools
+import weakref
 
 from church.ast import (
     Apply,
@@ -13,7 +14,7 @@ from church.ast import (
     parse_name,
     unparse,
 )
-from church.environment import environment
+from church.environment import environment, UndefinedNameError
 from church.token import tokenize, untokenize
 
 
@@ -22,6 +23,17 @@ class Parameter:
         self.name = name
 
 
+#: Codes used for functions and applications in Expr.debruijn. They're
+#: negative, so can't be confused with de Bruijn indices.
+FUNCTION_CODE = -1
+APPLY_CODE = -2
+CONSTANT_CODE = -3
+
+#: Constants used when combining hashes of pieces of an Expr.
+HASH_MULTIPLIER = 1000003
+HASH_MASK = (1 << 61) - 1
+
+
 class Expr:
     def flatten(self):
         """
@@ -58,13 +70,69 @@ class Expr:
                 bits.append("1")
                 bits.append("1" * index)
                 bits.append("0")
+            elif piece == "CONSTANT":
+                raise ValueError("Native constants have no bit string.")
         return ''.join(bits)
 
+    def debruijn(self):
+        """
+        Generate an alpha-invariant encoding of an expr, one piece at a
+        time.
+
+        Each function yields FUNCTION_CODE and each application
+        APPLY_CODE, in prefix order.  Each bound name yields its de Bruijn
+        index (a nonnegative integer), and each free name yields its
+        Parameter.  Each native constant yields a tuple (CONSTANT_CODE,
+        type, value).
+        """
+        levels = {}
+        depth = 0
+        for piece, arg in self.flatten():
+            if piece == "APPLY":
+                yield APPLY_CODE
+            elif piece == "FUNCTION":
+                yield FUNCTION_CODE
+                levels.setdefault(arg, []).append(depth)
+                depth += 1
+            elif piece == "CLOSE_FUNCTION":
+                depth -= 1
+                levels[arg].pop()
+            elif piece == "NAME":
+                arg_levels = levels.get(arg)
+                if arg_levels:
+                    yield depth - 1 - arg_levels[-1]
+                else:
+                    yield arg
+            elif piece == "CONSTANT":
+                # Include the type, so that true and 1 differ.
+                yield CONSTANT_CODE, type(arg), arg
+
     def __eq__(self, other):
-        return (
-            type(self) == type(other)
-            and self.bitstring() == other.bitstring()
-        )
+        if self is other:
+            # Common for hash-consed terms.
+            return True
+        if not isinstance(other, Expr):
+            return NotImplemented
+        # Compare the encodings lazily, so that we stop at the first
+        # difference rather than building both encodings in full.
+        pairs = itertools.zip_longest(self.debruijn(), other.debruijn())
+        for self_piece, other_piece in pairs:
+            if self_piece != other_piece:
+                return False
+        return True
+
+    def __hash__(self):
+        # Alpha-invariant and consistent with __eq__.  Computed on first
+        # use and cached, as Expr instances are never modified.
+        try:
+            return self._hash
+        except AttributeError:
+            pass
+        value = 0
+        for piece in self.debruijn():
+            value = ((value * HASH_MULTIPLIER) ^ hash(piece)) & HASH_MASK
+        self._hash = value
+        return value
 
     def __matmul__(self, other):
         return ApplyExpr(self, other)
@@ -98,8 +166,11 @@ class FunctionExpr(Expr):
 
 
 class NameExpr(Expr):
-    def __init__(self, parameter):
+    def __init__(self, parameter, slot=None):
         self.parameter = parameter
+        # Environment slot (de Bruijn level) of the binding, if recorded
+        # at bind time; allows constant-time lookup during reduction.
+        self.slot = slot
 
     def _pieces(self):
         return [
@@ -107,6 +178,97 @@ class NameExpr(Expr):
         ]
 
 
+def constant_literal(value):
+    """
+    Return the name used in source code for a native constant value.
+    """
+    if type(value) == bool:
+        return "true" if value else "false"
+    return str(value)
+
+
+class ConstantExpr(Expr):
+    """
+    Native constant: a nonnegative integer, a boolean, or a primitive
+    operation (see church.native).
+    """
+    def __init__(self, value):
+        self.value = value
+
+    def _pieces(self):
+        return [
+            ("YIELD", ("CONSTANT", self.value)),
+        ]
+
+
+class ExprBuilder:
+    """
+    Factory for Expr nodes, used by bind and reduce.
+
+    This default builder simply creates a new node each time.
+    """
+    def apply(self, function, argument):
+        return ApplyExpr(function, argument)
+
+    def function(self, parameter, body):
+        return FunctionExpr(parameter, body)
+
+    def name(self, parameter, slot=None):
+        return NameExpr(parameter, slot)
+
+    def constant(self, value):
+        return ConstantExpr(value)
+
+
+class HashConsingBuilder(ExprBuilder):
+    """
+    Builder that interns nodes, so that structurally identical subterms
+    built through the same builder are the same object.
+
+    Nodes are held in a weak table, so an interned node is discarded
+    once nothing else refers to it.  Children are identified by id:
+    that's safe, since an interned node keeps its children alive for
+    as long as its table entry exists.
+    """
+    def __init__(self):
+        self._table = weakref.WeakValueDictionary()
+
+    def __len__(self):
+        return len(self._table)
+
+    def apply(self, function, argument):
+        key = ("apply", id(function), id(argument))
+        node = self._table.get(key)
+        if node is None:
+            node = self._table[key] = ApplyExpr(function, argument)
+        return node
+
+    def function(self, parameter, body):
+        key = ("function", parameter, id(body))
+        node = self._table.get(key)
+        if node is None:
+            node = self._table[key] = FunctionExpr(parameter, body)
+        return node
+
+    def name(self, parameter, slot=None):
+        key = ("name", parameter, slot)
+        node = self._table.get(key)
+        if node is None:
+            node = self._table[key] = NameExpr(parameter, slot)
+        return node
+
+    def constant(self, value):
+        key = ("constant", type(value), value)
+        node = self._table.get(key)
+        if node is None:
+            node = self._table[key] = ConstantExpr(value)
+        return node
+
+
+#: Builder used when none is specified.
+DEFAULT_BUILDER = ExprBuilder()
+
+
 NAME = "name"
 OPEN_FUNCTION = "open_function"
 CLOSE_FUNCTION = "close_function"
@@ -117,38 +279,60 @@ YIELD = "yield"
 PROCESS = "process"
 
 
-def bind(ast, env):
+def bind(ast, env, slots=False, builder=DEFAULT_BUILDER, natives=None):
     """
     Match names to function parameters in the given Ast instance.
+
+    If slots is true, also record in each NameExpr the environment slot
+    of its binding, so that the resulting term can be evaluated in env
+    with constant-time variable access.
+
+    Nodes of the result are created using the given ExprBuilder.
+
+    If natives is given, it should be a mapping from names to the values
+    of native constants (such as church.native.NATIVES).  Names not bound
+    in env are then looked up there, and become ConstantExpr nodes.
     """
     expr_stack = []
 
     for action, arg in ast.flatten():
         if action == AstToken.NAME:
-            parameter, value = env.lookup_by_name(arg)
+            try:
+                if slots:
+                    slot, parameter, value = env.lookup_slot_by_name(arg)
+                else:
+                    slot = None
+                    parameter, value = env.lookup_by_name(arg)
+            except UndefinedNameError:
+                native = None if natives is None else natives.get(arg)
+                if native is None:
+                    raise
+                expr_stack.append(builder.constant(native))
+                continue
+
             if isinstance(value, NameExpr):
                 # name added by this function
                 expr_stack.append(value)
             else:
                 # suspension from definition
-                expr_stack.append(NameExpr(parameter))
+                expr_stack.append(builder.name(parameter, slot))
 
         elif action == AstToken.OPEN_FUNCTION:
             parameter = Parameter(arg)
             expr_stack.append(parameter)
-            value = NameExpr(parameter)
+            value = builder.name(parameter, env.depth if slots else None)
             env = env.append(parameter, value)
         elif action == AstToken.CLOSE_FUNCTION:
             env = env.pop()
             body = expr_stack.pop()
             parameter = expr_stack.pop()
-            expr_stack.append(FunctionExpr(parameter, body))
+            expr_stack.append(builder.function(parameter, body))
         elif action == AstToken.OPEN_APPLY:
             pass
         elif action == AstToken.CLOSE_APPLY:
             arg = expr_stack.pop()
             fn = expr_stack.pop()
-            expr_stack.append(ApplyExpr(fn, arg))
+            expr_stack.append(builder.apply(fn, arg))
         else:
             raise RuntimeError("Unexpected action: {!r}".format(action))
 
@@ -156,19 +340,20 @@ def bind(ast, env):
     return result
 
 
-def bind_definition(definition, env):
+def bind_definition(definition, env, slots=False, builder=DEFAULT_BUILDER,
+                    natives=None):
     """
     Bind variables in a definition.
     """
     parameters = []
     for arg in definition.arguments:
         parameter = Parameter(arg)
-        value = NameExpr(parameter)
+        value = builder.name(parameter, env.depth if slots else None)
         env = env.append(parameter, value)
         parameters.append(parameter)
-    body = bind(definition.body, env)
+    body = bind(definition.body, env, slots, builder, natives)
     while parameters:
-        body = FunctionExpr(parameters.pop(), body)
+        body = builder.function(parameters.pop(), body)
     return Parameter(definition.name), body
 
 
@@ -225,17 +410,22 @@ def unbind(expr, replacements=None):
             names_in_scope.remove(name)
         elif piece == "NAME":
             result_stack.append(Name(replacements[arg]))
+        elif piece == "CONSTANT":
+            result_stack.append(Name(constant_literal(arg)))
 
     result, = result_stack
     return result
 
 
-def expr(input, env=environment()):
-    return bind(parse(tokenize(input)), env)
+def expr(input, env=environment(), slots=False, builder=DEFAULT_BUILDER,
+         natives=None):
+    return bind(parse(tokenize(input)), env, slots, builder, natives)
 
 
-def definition(input, env=environment()):
-    return bind_definition(parse_definition(tokenize(input)), env)
+def definition(input, env=environment(), slots=False,
+               builder=DEFAULT_BUILDER, natives=None):
+    return bind_definition(
+        parse_definition(tokenize(input)), env, slots, builder, natives)
 
 
 def name(input, env=environment()):
@@ -0,0 +1,390 @@
+"""
+Binary images of environments, for saving and restoring sessions.
+
+An image records a complete environment chain: every binding, every
+Suspension term together with the environment it was defined in, and the
+identities of the Parameter instances shared between them.  Loading an
+image is a single bulk read followed by a linear decoding pass, which is
+much faster than re-tokenizing, re-parsing and re-binding the original
+definitions.
+
+Layout (all integers are little-endian unsigned 32-bit values):
+
+- header: magic, format version, then the number of entries in each of
+  the sections below, then the index of the root environment node.
+- names: end offsets of each name in the name data, followed by the
+  UTF-8 encoded name data itself, padded to a multiple of four bytes.
+- parameters: for each Parameter, the index of its name.
+- codes: the terms of all suspensions, in postfix order. NAME_CODE is
+  followed by a parameter index and a slot (plus one, zero meaning no
+  slot), FUNCTION_CODE by a parameter index, and APPLY_CODE stands alone.
+- suspensions: for each Suspension, the start and end of its term in
+  codes, and the index of its environment node.
+- nodes: for each environment node, its kind, parent node, bound
+  parameter, value kind, value index, and value slot (plus one).  Nodes
+  are stored so that every node comes after the nodes it depends on.
+"""
+import array
+import gc
+import struct
+import sys
+
+from church.environment import (
+    ChildEnvironment,
+    EmptyEnvironment,
+    IndexedEnvironment,
+    SlotEnvironment,
+)
+from church.eval import Suspension
+from church.expr import ApplyExpr, FunctionExpr, NameExpr, Parameter
+
+
+#: Magic bytes identifying an image file.
+MAGIC = b"CHURCHIM"
+
+#: Version of the image format.
+VERSION = 1
+
+#: Header: magic, version, counts of names, name data bytes, parameters,
+#: codes, suspensions and nodes, and the index of the root node.
+HEADER = struct.Struct("<8sIIIIIIII")
+
+#: Codes for terms.
+NAME_CODE = 0
+FUNCTION_CODE = 1
+APPLY_CODE = 2
+
+#: Kinds of environment node.
+EMPTY_NODE = 0
+EMPTY_INDEXED_NODE = 1
+CHILD_NODE = 2
+INDEXED_NODE = 3
+SLOT_NODE = 4
+
+#: Kinds of value held in an environment node.
+SUSPENSION_VALUE = 0
+NAME_VALUE = 1
+
+#: Number of integers describing each suspension and each node.
+SUSPENSION_FIELDS = 3
+NODE_FIELDS = 6
+
+#: Value used for "no parent" and "no parameter".
+NONE_INDEX = 0xFFFFFFFF
+
+
+class ImageError(Exception):
+    """
+    Exception raised when an image can't be created or decoded.
+    """
+    pass
+
+
+def _node_kind(env):
+    if type(env) == EmptyEnvironment:
+        return EMPTY_NODE
+    elif type(env) == ChildEnvironment:
+        return CHILD_NODE
+    elif type(env) == SlotEnvironment:
+        return SLOT_NODE
+    elif type(env) == IndexedEnvironment:
+        return INDEXED_NODE if env else EMPTY_INDEXED_NODE
+    raise ImageError("Unsupported environment type: {}".format(type(env)))
+
+
+def _slot_code(slot):
+    return 0 if slot is None else slot + 1
+
+
+def _int_array(values=()):
+    int_array = array.array("I", values)
+    if int_array.itemsize != 4:
+        raise ImageError("Platform has no 32-bit unsigned array type.")
+    return int_array
+
+
+class _ImageWriter:
+    """
+    Accumulates the sections of an image.
+    """
+    def __init__(self):
+        self.names = []
+        self.name_indices = {}
+        self.parameters = {}
+        self.parameter_names = _int_array()
+        self.codes = _int_array()
+        self.suspensions = {}
+        self.suspension_data = _int_array()
+        self.nodes = {}
+        self.node_data = _int_array()
+
+    def parameter(self, parameter):
+        index = self.parameters.get(parameter)
+        if index is None:
+            name_index = self.name_indices.get(parameter.name)
+            if name_index is None:
+                name_index = self.name_indices[parameter.name] = len(
+                    self.names)
+                self.names.append(parameter.name)
+            index = self.parameters[parameter] = len(self.parameters)
+            self.parameter_names.append(name_index)
+        return index
+
+    def term(self, term):
+        start = len(self.codes)
+        to_do = [("PROCESS", term)]
+        while to_do:
+            action, arg = to_do.pop()
+            if action == "FUNCTION":
+                self.codes.extend([FUNCTION_CODE, self.parameter(arg)])
+            elif action == "APPLY":
+                self.codes.append(APPLY_CODE)
+            elif type(arg) == NameExpr:
+                self.codes.extend([
+                    NAME_CODE,
+                    self.parameter(arg.parameter),
+                    _slot_code(arg.slot),
+                ])
+            elif type(arg) == FunctionExpr:
+                to_do.extend([
+                    ("FUNCTION", arg.parameter),
+                    ("PROCESS", arg.body),
+                ])
+            elif type(arg) == ApplyExpr:
+                to_do.extend([
+                    ("APPLY", None),
+                    ("PROCESS", arg.argument),
+                    ("PROCESS", arg.function),
+                ])
+            else:
+                raise ImageError("Unsupported term type: {}".format(
+                    type(arg)))
+        return start, len(self.codes)
+
+    def add_environment(self, root):
+        """
+        Add an environment, and everything it depends on.
+        """
+        # Iterative depth-first traversal, emitting each node after all
+        # of its dependencies: its parent, and the environment of any
+        # suspension it holds.
+        to_do = [(False, root)]
+        while to_do:
+            ready, env = to_do.pop()
+            if env in self.nodes:
+                continue
+            if ready:
+                self.add_node(env)
+                continue
+            to_do.append((True, env))
+            if env:
+                to_do.append((False, env.env))
+                if type(env.val) == Suspension:
+                    to_do.append((False, env.val.env))
+        return self.nodes[root]
+
+    def add_node(self, env):
+        kind = _node_kind(env)
+        if env:
+            parent = self.nodes[env.env]
+            var = self.parameter(env.var)
+            if type(env.val) == Suspension:
+                value_kind, value, slot = (
+                    SUSPENSION_VALUE, self.suspension(env.val), 0)
+            else:
+                value_kind = NAME_VALUE
+                value = self.parameter(env.val.parameter)
+                slot = _slot_code(env.val.slot)
+        else:
+            parent = var = value = NONE_INDEX
+            value_kind = slot = 0
+        self.nodes[env] = len(self.nodes)
+        self.node_data.extend([kind, parent, var, value_kind, value, slot])
+
+    def suspension(self, suspension):
+        index = self.suspensions.get(suspension)
+        if index is None:
+            start, end = self.term(suspension.term)
+            index = self.suspensions[suspension] = len(self.suspensions)
+            self.suspension_data.extend(
+                [start, end, self.nodes[suspension.env]])
+        return index
+
+    def to_bytes(self, root):
+        name_data = bytearray()
+        name_ends = _int_array()
+        for name in self.names:
+            name_data.extend(name.encode("utf-8"))
+            name_ends.append(len(name_data))
+        name_data.extend(bytes(-len(name_data) % 4))
+
+        header = HEADER.pack(
+            MAGIC,
+            VERSION,
+            len(self.names),
+            len(name_data),
+            len(self.parameters),
+            len(self.codes),
+            len(self.suspensions),
+            len(self.nodes),
+            root,
+        )
+        sections = [
+            name_ends,
+            self.parameter_names,
+            self.codes,
+            self.suspension_data,
+            self.node_data,
+        ]
+        if sys.byteorder != "little":
+            for section in sections:
+                section.byteswap()
+        return b"".join(
+            [header, name_ends.tobytes(), bytes(name_data)]
+            + [section.tobytes() for section in sections[1:]]
+        )
+
+
+def dumps_image(env):
+    """
+    Encode an environment as an image, returned as a bytes object.
+    """
+    writer = _ImageWriter()
+    root = writer.add_environment(env)
+    return writer.to_bytes(root)
+
+
+def dump_image(env, file):
+    """
+    Write an image of an environment to a binary file object.
+    """
+    file.write(dumps_image(env))
+
+
+def _read_ints(buffer, offset, count):
+    end = offset + 4 * count
+    if end > len(buffer):
+        raise ImageError("Truncated image.")
+    ints = _int_array()
+    ints.frombytes(buffer[offset:end])
+    if sys.byteorder != "little":
+        ints.byteswap()
+    return ints, end
+
+
+def loads_image(buffer):
+    """
+    Decode an environment from an image held in a bytes-like object
+    (for example bytes, or a memory-mapped file).
+    """
+    buffer = memoryview(buffer)
+    if len(buffer) < HEADER.size:
+        raise ImageError("Truncated image.")
+    (
+        magic, version, name_count, name_bytes, parameter_count,
+        code_count, suspension_count, node_count, root,
+    ) = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ImageError("Not an image file.")
+    if version != VERSION:
+        raise ImageError("Unsupported image version: {}".format(version))
+
+    offset = HEADER.size
+    name_ends, offset = _read_ints(buffer, offset, name_count)
+    name_data = bytes(buffer[offset:offset + name_bytes])
+    offset += name_bytes
+    parameter_names, offset = _read_ints(buffer, offset, parameter_count)
+    codes, offset = _read_ints(buffer, offset, code_count)
+    suspension_data, offset = _read_ints(
+        buffer, offset, SUSPENSION_FIELDS * suspension_count)
+    node_data, offset = _read_ints(buffer, offset, NODE_FIELDS * node_count)
+
+    # Decoding allocates many long-lived objects and no cycles; pausing
+    # the cyclic garbage collector meanwhile makes loading several times
+    # faster for large images.
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        names, start = [], 0
+        for end in name_ends:
+            names.append(name_data[start:end].decode("utf-8"))
+            start = end
+        parameters = [Parameter(names[index]) for index in parameter_names]
+        name_exprs = {}
+        suspensions = [None] * suspension_count
+        nodes = []
+        for node_index in range(node_count):
+            kind, parent, var, value_kind, value, slot = node_data[
+                NODE_FIELDS * node_index:NODE_FIELDS * (node_index + 1)]
+            if kind == EMPTY_NODE:
+                nodes.append(EmptyEnvironment())
+                continue
+            elif kind == EMPTY_INDEXED_NODE:
+                nodes.append(IndexedEnvironment())
+                continue
+
+            if value_kind == SUSPENSION_VALUE:
+                if suspensions[value] is None:
+                    start, end, env = suspension_data[
+                        SUSPENSION_FIELDS * value:
+                        SUSPENSION_FIELDS * (value + 1)]
+                    term = _decode_term(
+                        codes, start, end, parameters, name_exprs)
+                    suspensions[value] = Suspension(term, nodes[env])
+                val = suspensions[value]
+            else:
+                val = _name_expr(name_exprs, parameters[value], slot)
+
+            node_type = {
+                CHILD_NODE: ChildEnvironment,
+                INDEXED_NODE: IndexedEnvironment,
+                SLOT_NODE: SlotEnvironment,
+            }[kind]
+            nodes.append(node_type(parameters[var], val, nodes[parent]))
+        return nodes[root]
+    except (IndexError, KeyError, ValueError, UnicodeDecodeError) as e:
+        raise ImageError("Corrupt image: {}".format(e))
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def load_image(file):
+    """
+    Read an environment from a binary file object holding an image.
+    """
+    return loads_image(file.read())
+
+
+def _name_expr(name_exprs, parameter, slot_code):
+    # Share NameExpr instances between occurrences, as bind does.
+    key = parameter, slot_code
+    name_expr = name_exprs.get(key)
+    if name_expr is None:
+        slot = None if slot_code == 0 else slot_code - 1
+        name_expr = name_exprs[key] = NameExpr(parameter, slot)
+    return name_expr
+
+
+def _decode_term(codes, start, end, parameters, name_exprs):
+    stack = []
+    position = start
+    while position < end:
+        code = codes[position]
+        if code == NAME_CODE:
+            parameter = parameters[codes[position + 1]]
+            stack.append(
+                _name_expr(name_exprs, parameter, codes[position + 2]))
+            position += 3
+        elif code == FUNCTION_CODE:
+            body = stack.pop()
+            stack.append(FunctionExpr(parameters[codes[position + 1]], body))
+            position += 2
+        elif code == APPLY_CODE:
+            argument, function = stack.pop(), stack.pop()
+            stack.append(ApplyExpr(function, argument))
+            position += 1
+        else:
+            raise ImageError("Corrupt image: bad term code {}".format(code))
+    term, = stack
+    return term
@@ -0,0 +1,245 @@
+"""
+Native numerals, booleans and arithmetic.
+
+An opt-in layer on top of the pure lambda calculus: terms bound with
+natives=NATIVES (see church.expr.bind) may use integer literals, true and
+false, and the primitives add, mul, pow, pred and iszero, provided those
+names aren't otherwise defined.  The reduction machine applies a
+primitive to native arguments directly (a delta rule), so arithmetic
+takes time proportional to the number of digits rather than to the
+values involved.
+
+Native constants behave exactly like their Church encodings: a numeral
+or boolean used as a function, or a primitive applied to arguments that
+aren't native constants, is replaced by the corresponding lambda term.
+
+The readback function turns a normal form back into source text,
+showing Church numerals, booleans, pairs and lists as literals.
+"""
+import re
+
+from church.expr import (
+    ApplyExpr,
+    ConstantExpr,
+    expr,
+    FunctionExpr,
+    NameExpr,
+    Parameter,
+    unexpr,
+)
+
+
+class Primitive:
+    """
+    Primitive operation on native constants.
+
+    Parameters
+    ----------
+    name : str
+        Name of the primitive in source code.
+    arity : int
+        Number of arguments taken.
+    function : callable
+        Function computing the result from the values of the arguments.
+    definition : str
+        The lambda term that this primitive implements.
+    """
+    def __init__(self, name, arity, function, definition):
+        self.name = name
+        self.arity = arity
+        self.function = function
+        self.definition = expr(definition)
+
+    def __str__(self):
+        return self.name
+
+    def evaluate(self, arguments):
+        """
+        Apply the delta rule for this primitive to a sequence of weak head
+        normal forms.
+
+        Returns the resulting constant value, or None if any argument
+        isn't a native integer.
+        """
+        values = []
+        for argument in arguments:
+            if type(argument) != ConstantExpr or type(argument.value) != int:
+                return None
+            values.append(argument.value)
+        return self.function(*values)
+
+
+#: Primitive operations, by name.
+PRIMITIVES = {
+    primitive.name: primitive
+    for primitive in [
+        Primitive("add", 2, lambda m, n: m + n, r"\m n f x.m f(n f x)"),
+        Primitive("mul", 2, lambda m, n: m * n, r"\m n f.m(n f)"),
+        Primitive("pow", 2, lambda m, n: m ** n, r"\m n.n m"),
+        Primitive(
+            "pred", 1, lambda n: max(n - 1, 0),
+            r"\n f x.n(\g h.h(g f))(\u.x)(\u.u)",
+        ),
+        Primitive("iszero", 1, lambda n: n == 0, r"\n.n(\x a b.b)(\a b.a)"),
+    ]
+}
+
+
+#: Names of native numerals.
+NUMERAL_REGEX = re.compile("[0-9]+")
+
+
+class _Natives:
+    """
+    Mapping from names to native constant values, for use with bind.
+    """
+    def get(self, name, default=None):
+        if NUMERAL_REGEX.fullmatch(name):
+            return int(name)
+        elif name == "true":
+            return True
+        elif name == "false":
+            return False
+        return PRIMITIVES.get(name, default)
+
+
+#: Names of all native constants.
+NATIVES = _Natives()
+
+
+#: Church encodings of the booleans.
+TRUE_TERM = expr(r"\x y.x")
+FALSE_TERM = expr(r"\x y.y")
+
+
+def church_term(value):
+    """
+    Return the lambda term encoding a native constant value.
+    """
+    if type(value) == bool:
+        return TRUE_TERM if value else FALSE_TERM
+    elif type(value) == int:
+        f, x = Parameter("f"), Parameter("x")
+        f_name, body = NameExpr(f), NameExpr(x)
+        for _ in range(value):
+            body = ApplyExpr(f_name, body)
+        return FunctionExpr(f, FunctionExpr(x, body))
+    return value.definition
+
+
+def _numeral(expr):
+    # Value of a Church numeral \f x.f(...(f x)), or None.
+    if type(expr) != FunctionExpr or type(expr.body) != FunctionExpr:
+        return None
+    f, x, body = expr.parameter, expr.body.parameter, expr.body.body
+    if f is x:
+        return None
+    value = 0
+    while type(body) == ApplyExpr:
+        if type(body.function) != NameExpr or body.function.parameter is not f:
+            return None
+        body, value = body.argument, value + 1
+    if type(body) != NameExpr or body.parameter is not x:
+        return None
+    return value
+
+
+def _boolean(expr):
+    # Value of the Church boolean true, or None.  (The encoding of false
+    # is the same as that of zero, which takes precedence.)
+    if type(expr) != FunctionExpr or type(expr.body) != FunctionExpr:
+        return None
+    x, y, body = expr.parameter, expr.body.parameter, expr.body.body
+    if x is not y and type(body) == NameExpr and body.parameter is x:
+        return True
+    return None
+
+
+def _pair(expr):
+    # Components of a pair \f.f a b, or None.
+    if type(expr) != FunctionExpr:
+        return None
+    f, body = expr.parameter, expr.body
+    if (type(body) == ApplyExpr and type(body.function) == ApplyExpr
+            and type(body.function.function) == NameExpr
+            and body.function.function.parameter is f):
+        return [body.function.argument, body.argument]
+    return None
+
+
+def _list(expr):
+    # Elements of a nonempty Church list \c n.c a(c b(... n)), or None.
+    if type(expr) != FunctionExpr or type(expr.body) != FunctionExpr:
+        return None
+    c, n, body = expr.parameter, expr.body.parameter, expr.body.body
+    if c is n:
+        return None
+    elements = []
+    while (type(body) == ApplyExpr and type(body.function) == ApplyExpr
+           and type(body.function.function) == NameExpr
+           and body.function.function.parameter is c):
+        elements.append(body.function.argument)
+        body = body.argument
+    if not elements or type(body) != NameExpr or body.parameter is not n:
+        return None
+    return elements
+
+
+def _literal(expr):
+    """
+    Recognise a literal, returning a pair (template, parts), or None.
+
+    The template is a format string with a {} placeholder for each of
+    parts, which are terms still to be read back.
+    """
+    if type(expr) == ConstantExpr:
+        return unexpr(expr), []
+    value = _numeral(expr)
+    if value is not None:
+        return str(value), []
+    if _boolean(expr):
+        return "true", []
+    parts = _pair(expr)
+    if parts is not None:
+        return "({}, {})", parts
+    parts = _list(expr)
+    if parts is not None:
+        return "[" + ", ".join(["{}"] * len(parts)) + "]", parts
+    return None
+
+
+def readback(expr):
+    """
+    Turn a term in normal form into a string, like unexpr, but showing
+    Church numerals, booleans, pairs and lists, as well as native
+    constants, as literals.
+
+    Pairs are shown as (a, b), and lists as [a, b, c].  A term with no
+    literal form, or whose components refer to variables bound outside
+    them, is shown as by unexpr.
+    """
+    # Iterative, to cope with deeply nested literals: to_do holds the
+    # terms still to be shown, and the templates waiting to be filled.
+    to_do = [("PROCESS", expr)]
+    results = []
+    while to_do:
+        action, arg = to_do.pop()
+        if action == "FILL":
+            template, count = arg
+            parts = results[len(results) - count:]
+            del results[len(results) - count:]
+            results.append(template.format(*parts))
+            continue
+        literal = _literal(arg)
+        if literal is None:
+            try:
+                results.append(unexpr(arg))
+            except KeyError:
+                # A component refers to an enclosing binder.
+                return unexpr(expr)
+        else:
+            template, parts = literal
+            to_do.append(("FILL", (template, len(parts))))
+            to_do.extend(("PROCESS", part) for part in reversed(parts))
+    result, = results
+    return result
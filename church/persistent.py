@@ -0,0 +1,239 @@
+"""
+Persistent (immutable, structure-sharing) data structures.
+
+Every "modifying" operation returns a new structure and leaves the
+original untouched; unchanged parts are shared between the old and new
+versions, so an update costs O(log n) time and space rather than O(n).
+"""
+
+#: Number of hash bits consumed at each level of the trie.
+BITS = 5
+
+#: Mask used to extract the bits for one level of the trie.
+MASK = (1 << BITS) - 1
+
+#: Bit shift at which hash bits run out and collision nodes take over.
+MAX_SHIFT = 64
+
+
+def _popcount(n):
+    return bin(n).count("1")
+
+
+class _BitmapNode:
+    """
+    Interior HAMT node.
+
+    Children are held in a compact tuple, indexed via a 32-bit bitmap
+    recording which of the 32 possible slots are occupied.  Each entry
+    is either a (key, value) pair or a further node.
+    """
+    def __init__(self, bitmap, entries):
+        self.bitmap = bitmap
+        self.entries = entries
+
+    def get(self, shift, key_hash, key, default):
+        node = self
+        while True:
+            bit = 1 << ((key_hash >> shift) & MASK)
+            if not node.bitmap & bit:
+                return default
+            entry = node.entries[_popcount(node.bitmap & (bit - 1))]
+            if type(entry) == tuple:
+                entry_key, entry_value = entry
+                if entry_key is key or entry_key == key:
+                    return entry_value
+                return default
+            node, shift = entry, shift + BITS
+            if type(node) == _CollisionNode:
+                return node.get(shift, key_hash, key, default)
+
+    def set(self, shift, key_hash, key, value):
+        """
+        Return a new node with key mapped to value, and a flag
+        indicating whether the key was newly added.
+        """
+        bit = 1 << ((key_hash >> shift) & MASK)
+        index = _popcount(self.bitmap & (bit - 1))
+        entries = self.entries
+
+        if not self.bitmap & bit:
+            new_entries = entries[:index] + ((key, value),) + entries[index:]
+            return _BitmapNode(self.bitmap | bit, new_entries), True
+
+        entry = entries[index]
+        if type(entry) == tuple:
+            entry_key, entry_value = entry
+            if entry_key is key or entry_key == key:
+                new_entry, added = (key, value), False
+            else:
+                new_entry, added = _make_node(
+                    shift + BITS,
+                    hash(entry_key), entry_key, entry_value,
+                    key_hash, key, value,
+                ), True
+        else:
+            new_entry, added = entry.set(shift + BITS, key_hash, key, value)
+
+        new_entries = entries[:index] + (new_entry,) + entries[index + 1:]
+        return _BitmapNode(self.bitmap, new_entries), added
+
+
+class _CollisionNode:
+    """
+    Leaf node holding entries whose keys have identical hashes.
+    """
+    def __init__(self, key_hash, entries):
+        self.key_hash = key_hash
+        self.entries = entries
+
+    def get(self, shift, key_hash, key, default):
+        if key_hash == self.key_hash:
+            for entry_key, entry_value in self.entries:
+                if entry_key is key or entry_key == key:
+                    return entry_value
+        return default
+
+    def set(self, shift, key_hash, key, value):
+        for index, (entry_key, _) in enumerate(self.entries):
+            if entry_key is key or entry_key == key:
+                entries = (
+                    self.entries[:index]
+                    + ((key, value),)
+                    + self.entries[index + 1:]
+                )
+                return _CollisionNode(key_hash, entries), False
+        entries = self.entries + ((key, value),)
+        return _CollisionNode(key_hash, entries), True
+
+
+def _make_node(shift, hash1, key1, value1, hash2, key2, value2):
+    """
+    Make a node containing two distinct keys.
+    """
+    if shift >= MAX_SHIFT:
+        return _CollisionNode(hash1, ((key1, value1), (key2, value2)))
+
+    index1 = (hash1 >> shift) & MASK
+    index2 = (hash2 >> shift) & MASK
+    if index1 == index2:
+        child = _make_node(
+            shift + BITS, hash1, key1, value1, hash2, key2, value2)
+        return _BitmapNode(1 << index1, (child,))
+
+    entry1, entry2 = (key1, value1), (key2, value2)
+    if index1 > index2:
+        entry1, entry2 = entry2, entry1
+    return _BitmapNode((1 << index1) | (1 << index2), (entry1, entry2))
+
+
+_EMPTY_NODE = _BitmapNode(0, ())
+
+#: Sentinel used to detect missing keys.
+_MISSING = object()
+
+
+class PersistentMap:
+    """
+    Immutable mapping implemented as a hash array mapped trie (HAMT).
+
+    Lookups and updates take O(log32 n) time; ``set`` returns a new
+    mapping that shares all untouched nodes with the original.
+    """
+    def __init__(self, root=_EMPTY_NODE, size=0):
+        self._root = root
+        self._size = size
+
+    def get(self, key, default=None):
+        return self._root.get(0, hash(key), key, default)
+
+    def __getitem__(self, key):
+        value = self._root.get(0, hash(key), key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self._root.get(0, hash(key), key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return self._size
+
+    def set(self, key, value):
+        """
+        Return a new mapping with key mapped to value.
+        """
+        root, added = self._root.set(0, hash(key), key, value)
+        return PersistentMap(root, self._size + added)
+
+
+def _new_path(shift, node):
+    """
+    Wrap a leaf node in enough single-child interior nodes to reach
+    the given level.
+    """
+    while shift > 0:
+        node, shift = (node,), shift - BITS
+    return node
+
+
+def _push_tail(count, shift, node, tail):
+    """
+    Return a copy of node with a full tail leaf inserted at the end.
+    """
+    index = ((count - 1) >> shift) & MASK
+    if shift == BITS:
+        child = tail
+    elif index < len(node):
+        child = _push_tail(count, shift - BITS, node[index], tail)
+    else:
+        child = _new_path(shift - BITS, tail)
+    # Vectors only grow at the end, so index is always either the last
+    # existing child or the next free one.
+    return node[:index] + (child,)
+
+
+class PersistentVector:
+    """
+    Immutable append-only sequence with O(log32 n) indexing.
+
+    Implemented as a 32-way trie of tuples, with a separate tail leaf so
+    that most appends only copy a small tuple.
+    """
+    def __init__(self, size=0, shift=BITS, root=(), tail=()):
+        self._size = size
+        self._shift = shift
+        self._root = root
+        self._tail = tail
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        if not 0 <= index < self._size:
+            raise IndexError("vector index out of range")
+        tail_offset = self._size - len(self._tail)
+        if index >= tail_offset:
+            return self._tail[index - tail_offset]
+        node, shift = self._root, self._shift
+        while shift > 0:
+            node = node[(index >> shift) & MASK]
+            shift -= BITS
+        return node[index & MASK]
+
+    def append(self, value):
+        """
+        Return a new vector with value added at the end.
+        """
+        size, shift, tail = self._size, self._shift, self._tail
+        if len(tail) <= MASK:
+            return PersistentVector(
+                size + 1, shift, self._root, tail + (value,))
+
+        if (size >> BITS) > (1 << shift):
+            # Root is full; grow the trie by one level.
+            root = (self._root, _new_path(shift, tail))
+            shift += BITS
+        else:
+            root = _push_tail(size, shift, self._root, tail)
+        return PersistentVector(size + 1, shift, root, (value,))
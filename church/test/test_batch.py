@@ -0,0 +1,149 @@
+import io
+import os
+import tempfile
+import unittest
+
+from church.__main__ import main
+from church.batch import run_file, run_script
+
+
+class TestBatch(unittest.TestCase):
+    def run_script(self, script, jobs=None):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        status = run_script(
+            io.StringIO(script), stdout, stderr, script_name="test.lam",
+            jobs=jobs)
+        return status, stdout.getvalue(), stderr.getvalue()
+
+    def test_successful_script(self):
+        status, output, errors = self.run_script(r"""
+# Church numerals.
+let two f x = f(f x)
+let add m n = \f x.m f(n f x)
+
+eval add two two  # four
+show two
+""")
+        self.assertEqual(status, 0)
+        self.assertEqual(output, "\\f x.f(f(f(f x)))\n\\f x.f(f x)\n")
+        self.assertRegex(errors, r"^Ran 4 commands in \d+\.\d+ seconds.\n$")
+
+    def test_stops_at_first_error(self):
+        status, output, errors = self.run_script(r"""
+let two f x = f(f x)
+eval three
+eval two
+""")
+        self.assertEqual(status, 1)
+        self.assertEqual(output, "")
+        self.assertEqual(
+            errors.splitlines()[:2],
+            ["Undefined name: three", "test.lam, line 3: eval three"],
+        )
+        self.assertIn("Ran 2 commands", errors)
+
+    def test_unknown_command_is_an_error(self):
+        status, output, errors = self.run_script("frobnicate\n")
+        self.assertEqual(status, 1)
+        self.assertIn("Unknown syntax: frobnicate", errors)
+
+    def test_exit_stops_script(self):
+        status, output, errors = self.run_script(r"""
+let two f x = f(f x)
+exit
+eval three
+""")
+        self.assertEqual(status, 0)
+        self.assertEqual(output, "")
+
+    def test_parallel_matches_sequential(self):
+        script = r"""
+let two f x = f(f x)
+let add m n = \f x.m f(n f x)
+let mul m n f = m (n f)
+eval mul two two
+show add
+let two = add two two  # shadowing
+eval mul two two
+eval --stats two
+eval --fuel=10000 \x.x
+"""
+        sequential = self.run_script(script)
+        parallel = self.run_script(script, jobs=2)
+        self.assertEqual(parallel[:2], sequential[:2])
+        self.assertEqual(parallel[0], 0)
+        self.assertEqual(
+            parallel[1].splitlines()[:3],
+            [r"\f x.f(f(f(f x)))", r"\m n f x.m f(n f x)",
+             r"\f x.f(f(f(f(f(f(f(f(f(f(f(f(f(f(f(f x)))))))))))))))"],
+        )
+
+    def test_parallel_stops_at_first_error(self):
+        script = r"""
+let two f x = f(f x)
+eval two
+eval --fuel=3 two two two
+eval two
+eval undefined
+"""
+        status, output, errors = self.run_script(script, jobs=2)
+        self.assertEqual(status, 1)
+        self.assertEqual(output, "\\f x.f(f x)\n")
+        self.assertEqual(errors.splitlines()[:2], [
+            "Reduction stopped after 3 steps: step budget exhausted.",
+            "test.lam, line 4: eval --fuel=3 two two two",
+        ])
+        self.assertIn("Ran 3 commands", errors)
+
+        status, output, errors = self.run_script(
+            "eval \\x.x\neval undefined\neval \\y.y\n", jobs=2)
+        self.assertEqual(status, 1)
+        self.assertEqual(output, "\\x.x\n")
+        self.assertEqual(errors.splitlines()[:2], [
+            "Undefined name: undefined",
+            "test.lam, line 2: eval undefined",
+        ])
+
+    def test_parallel_with_load_image(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            image_path = os.path.join(temp_dir, "prelude.img")
+            script = "\n".join([
+                "let id x = x",
+                "let two f x = f(f x)",
+                "save {0}",
+                "eval id two",
+                "let two = id",
+                "eval two two",
+                "load-image {0}",
+                "eval two id",
+                "",
+            ]).format(image_path)
+            status, output, errors = self.run_script(script, jobs=2)
+        self.assertEqual(status, 0)
+        self.assertEqual(output, "\\f x.f(f x)\n\\x.x\n\\x.x\n")
+
+    def test_run_file(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            script_path = os.path.join(temp_dir, "script.lam")
+            with open(script_path, "w", encoding="utf-8") as script_file:
+                script_file.write("let id x = x\neval id id\n")
+
+            stdout, stderr = io.StringIO(), io.StringIO()
+            self.assertEqual(run_file(script_path, stdout, stderr), 0)
+            self.assertEqual(stdout.getvalue(), "\\x.x\n")
+
+            missing_path = os.path.join(temp_dir, "missing.lam")
+            stdout, stderr = io.StringIO(), io.StringIO()
+            self.assertEqual(run_file(missing_path, stdout, stderr), 1)
+            self.assertIn("missing.lam", stderr.getvalue())
+
+    def test_main_run(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            script_path = os.path.join(temp_dir, "script.lam")
+            with open(script_path, "w", encoding="utf-8") as script_file:
+                script_file.write("eval \\x.x\neval undefined\n")
+            self.assertEqual(main(["run", script_path]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,6 @@
 import io
+import os
+import tempfile
 import unittest
 
 from church.cli import LambdaCmd
@@ -166,3 +168,169 @@ exit
         self.assertEqual(len(output_lines), 2)
         self.assertEqual(output_lines[0], r"\f x.f(f(f(f x)))")
         self.assertEqual(output_lines[1], r"\f x.f(f(f(f(f(f x)))))")
+
+    def test_eval_stats(self):
+        test_script = r"""
+let two f x = f (f x)
+eval --stats two two
+exit
+"""
+        output = self.process_script(test_script)
+        output_lines = output.splitlines()
+        self.assertEqual(output_lines[0], r"\x x0.x(x(x(x x0)))")
+        stats = dict(line.split(": ") for line in output_lines[1:])
+        self.assertEqual(
+            set(stats),
+            {
+                "steps",
+                "beta_steps",
+                "lookups",
+                "chain_walk",
+                "max_chain_walk",
+                "suspensions",
+                "max_to_do",
+                "max_results",
+            },
+        )
+        self.assertGreater(int(stats["beta_steps"]), 0)
+
+    def test_eval_unknown_option(self):
+        test_script = r"""
+eval --bogus \x.x
+exit
+"""
+        output = self.process_script(test_script)
+        self.assertEqual(output, "Unknown option: --bogus\n")
+
+    def test_eval_limits_and_continue(self):
+        test_script = r"""
+let two f x = f (f x)
+let pow m n = n m
+eval --fuel=50 pow two (pow two two)
+continue --fuel=50
+continue
+continue
+eval --timeout=0.05 (\x.x x)(\x.x x)
+eval --fuel=lots two
+exit
+"""
+        output = self.process_script(test_script)
+        output_lines = output.splitlines()
+        self.assertEqual(len(output_lines), 6)
+        self.assertEqual(
+            output_lines[0],
+            "Reduction stopped after 50 steps: step budget exhausted. "
+            "Type 'continue' to resume.",
+        )
+        self.assertEqual(
+            output_lines[1],
+            "Reduction stopped after 100 steps: step budget exhausted. "
+            "Type 'continue' to resume.",
+        )
+        self.assertEqual(
+            output_lines[2], r"\x x0." + "x(" * 15 + "x x0" + ")" * 15)
+        self.assertEqual(
+            output_lines[3], "No stopped evaluation to continue.")
+        self.assertTrue(output_lines[4].endswith(
+            "deadline reached. Type 'continue' to resume."))
+        self.assertEqual(output_lines[5], "Invalid value for --fuel: lots")
+
+    def test_eval_cache(self):
+        test_script = r"""
+let two f x = f (f x)
+cache size 10
+eval two two
+eval two two
+eval --stats two two
+eval (\a.a) two
+eval (\b.b) two
+cache
+cache clear
+cache
+cache size ten
+exit
+"""
+        output = self.process_script(test_script)
+        output_lines = output.splitlines()
+        self.assertEqual(output_lines[:2], [r"\x x0.x(x(x(x x0)))"] * 2)
+        self.assertEqual(output_lines[-9:], [
+            "size: 2",
+            "maxsize: 10",
+            "hits: 2",
+            "misses: 2",
+            "size: 0",
+            "maxsize: 10",
+            "hits: 0",
+            "misses: 0",
+            "Usage: cache [clear | size <entries>]",
+        ])
+
+    def test_native(self):
+        test_script = r"""
+native
+eval pow 10 3
+native on
+native
+let ten = add 5 5
+let pair a b f = f a b
+eval pow ten 3
+eval pair (iszero 0) (\c n.c 1(c 2 n))
+eval --stats mul 3 4
+native off
+eval ten
+native maybe
+exit
+"""
+        output = self.process_script(test_script)
+        output_lines = output.splitlines()
+        self.assertEqual(output_lines[:5], [
+            "off",
+            "Undefined name: pow",
+            "on",
+            "1000",
+            "(true, [1, 2])",
+        ])
+        self.assertEqual(output_lines[5], "12")
+        self.assertEqual(output_lines[-2:], [
+            "10",
+            "Usage: native [on | off]",
+        ])
+
+    def test_save_and_load_image(self):
+        with tempfile.TemporaryDirectory() as tempdir:
+            image_path = os.path.join(tempdir, "session.img")
+            save_script = r"""
+let two f x = f (f x)
+let add m n = \f x.m f(n f x)
+let four = add two two
+save {}
+exit
+""".format(image_path)
+            self.assertEqual(self.process_script(save_script), "")
+
+            load_script = r"""
+let four = two
+load-image {}
+show four
+eval four
+load-image {}
+help load-image
+exit
+""".format(image_path, os.path.join(tempdir, "missing.img"))
+            output_lines = self.process_script(load_script).splitlines()
+
+        self.assertEqual(output_lines[0], "Undefined name: two")
+        self.assertEqual(output_lines[1], "add two two")
+        self.assertEqual(output_lines[2], r"\f x.f(f(f(f x)))")
+        self.assertIn("No such file", output_lines[3])
+        self.assertIn("image file", output_lines[4])
+
+    def test_save_and_load_usage(self):
+        test_script = r"""
+save
+load-image
+exit
+"""
+        output = self.process_script(test_script)
+        self.assertEqual(
+            output, "Usage: save <file>\nUsage: load-image <file>\n")
@@ -0,0 +1,93 @@
+import unittest
+
+from church.environment import (
+    environment,
+    indexed_environment,
+    UndefinedNameError,
+)
+from church.expr import NameExpr, Parameter
+
+
+class TestEnvironment(unittest.TestCase):
+    def check_environment_behaviour(self, empty):
+        x1, x2, y = Parameter("x"), Parameter("x"), Parameter("y")
+        vx1, vx2, vy = NameExpr(x1), NameExpr(x2), NameExpr(y)
+
+        env = empty.append(x1, vx1).append(y, vy)
+        shadowed = env.append(x2, vx2)
+
+        self.assertFalse(empty)
+        self.assertTrue(env)
+
+        # Lookup by parameter sees every binding, shadowed or not.
+        self.assertIs(shadowed.lookup(x1), vx1)
+        self.assertIs(shadowed.lookup(x2), vx2)
+        self.assertIs(shadowed.lookup(y), vy)
+        with self.assertRaises(UndefinedNameError):
+            env.lookup(x2)
+
+        # Lookup by name sees only the innermost binding.
+        self.assertEqual(shadowed.lookup_by_name("x"), (x2, vx2))
+        self.assertEqual(env.lookup_by_name("x"), (x1, vx1))
+        with self.assertRaises(UndefinedNameError):
+            shadowed.lookup_by_name("z")
+
+        # Popping restores the previous environment.
+        self.assertEqual(shadowed.pop().lookup_by_name("x"), (x1, vx1))
+        with self.assertRaises(ValueError):
+            empty.pop()
+
+        self.assertEqual(
+            [var for var, _ in shadowed],
+            [x2, y, x1],
+        )
+
+        # Slot lookups, including a slot that doesn't hold the variable.
+        self.assertEqual(shadowed.depth, 3)
+        self.assertIs(shadowed.lookup_slot(x1, 0), vx1)
+        self.assertIs(shadowed.lookup_slot(x2, 2), vx2)
+        self.assertIs(shadowed.lookup_slot(x2, 0), vx2)
+        self.assertIs(env.lookup_slot(y, 7), vy)
+        self.assertEqual(shadowed.lookup_slot_by_name("x"), (2, x2, vx2))
+        self.assertEqual(shadowed.lookup_slot_by_name("y"), (1, y, vy))
+        with self.assertRaises(UndefinedNameError):
+            shadowed.lookup_slot_by_name("z")
+
+    def test_linked_environment(self):
+        self.check_environment_behaviour(environment())
+
+    def test_indexed_environment(self):
+        self.check_environment_behaviour(indexed_environment())
+
+    def test_indexed_environment_many_bindings(self):
+        env = indexed_environment()
+        parameters = [Parameter("v{}".format(i)) for i in range(5000)]
+        for parameter in parameters:
+            env = env.append(parameter, NameExpr(parameter))
+        for parameter in parameters:
+            self.assertIs(env.lookup(parameter).parameter, parameter)
+            self.assertIs(env.lookup_by_name(parameter.name)[0], parameter)
+        for slot, parameter in enumerate(parameters):
+            value = env.lookup_slot(parameter, slot)
+            self.assertIs(value.parameter, parameter)
+
+    def test_extend_indexed_environment(self):
+        parameters = [Parameter("v{}".format(i)) for i in range(100)]
+        env = indexed_environment()
+        for parameter in parameters[:50]:
+            env = env.append(parameter, NameExpr(parameter))
+        for parameter in parameters[50:]:
+            env = env.extend(parameter, NameExpr(parameter))
+        self.assertEqual(type(env).__name__, "SlotEnvironment")
+        self.assertEqual(env.depth, 100)
+
+        for slot, parameter in enumerate(parameters):
+            self.assertIs(env.lookup(parameter).parameter, parameter)
+            value = env.lookup_slot(parameter, slot)
+            self.assertIs(value.parameter, parameter)
+            self.assertEqual(
+                env.lookup_slot_by_name(parameter.name)[:2], (slot, parameter))
+        self.assertEqual(
+            [var for var, _ in env], list(reversed(parameters)))
+        with self.assertRaises(UndefinedNameError):
+            env.lookup(Parameter("v0"))
@@ -1,7 +1,21 @@
+import os
+import signal
+import threading
 import unittest
 
-from church.eval import reduce
-from church.expr import expr
+from church.environment import environment, indexed_environment
+from church.eval import (
+    FUEL_EXHAUSTED,
+    INTERRUPTED,
+    NormalFormCache,
+    reduce,
+    Reduction,
+    ReductionInterrupted,
+    ReductionStats,
+    Suspension,
+    TIMED_OUT,
+)
+from church.expr import definition, expr, HashConsingBuilder
 
 
 class TestEval(unittest.TestCase):
@@ -86,3 +100,206 @@ class TestEval(unittest.TestCase):
             nested = id @ nested
 
         self.assertEqual(reduce(nested), true)
+
+    def test_reduce_with_slots(self):
+        definitions = [
+            r"two f x = f(f x)",
+            r"add m n = \f x.m f(n f x)",
+            r"mul m n f = m(n f)",
+            r"sixteen = mul (add two two) (add two two)",
+        ]
+        expected = expr(r"\f x." + "f(" * 16 + "x" + ")" * 16)
+        for env in [environment(), indexed_environment()]:
+            with self.subTest(env=type(env).__name__):
+                for text in definitions:
+                    name, body = definition(text, env, slots=True)
+                    env = env.append(name, Suspension(body, env))
+                term = expr("sixteen", env, slots=True)
+                self.assertEqual(reduce(term, env), expected)
+
+                # Slots are only a hint: evaluation in an extended
+                # environment still finds the right bindings.
+                name, body = definition("two = add", env, slots=True)
+                shifted_env = env.append(name, Suspension(body, env))
+                self.assertEqual(reduce(term, shifted_env), expected)
+
+    def test_reduce_lazy(self):
+        env = environment()
+        for text in [
+            r"two f x = f(f x)",
+            r"three f x = f(f(f x))",
+            r"add m n = \f x.m f(n f x)",
+            r"mul m n f = m(n f)",
+            r"pow m n = n m",
+            r"dup n = add n n",
+            r"nine = pow three two",
+        ]:
+            name, body = definition(text, env)
+            env = env.append(name, Suspension(body, env))
+
+        for text in [
+            "nine",
+            "dup (dup (dup nine))",
+            "mul (pow two three) (dup three)",
+            r"\f.dup three (two f)",
+            r"\f x.f",
+        ]:
+            with self.subTest(text=text):
+                term = expr(text, env)
+                self.assertEqual(
+                    reduce(term, env, lazy=True),
+                    reduce(term, env),
+                )
+
+        # Definitions forced during a lazy reduction keep their values.
+        _, nine = env.lookup_by_name("nine")
+        self.assertIsNotNone(nine.whnf)
+        self.assertEqual(
+            nine.normal_form,
+            expr(r"\f x." + "f(" * 9 + "x" + ")" * 9),
+        )
+
+    def test_reduce_lazy_deeply_nested(self):
+        id = expr(r"\x.x")
+        true = expr(r"\x y.x")
+
+        nested = true
+        for _ in range(3000):
+            nested = id @ nested
+
+        self.assertEqual(reduce(nested, lazy=True), true)
+
+    def test_reduce_stats(self):
+        id = expr(r"\x.x")
+        stats = ReductionStats()
+        self.assertEqual(reduce(id @ id, stats=stats), id)
+        self.assertEqual(
+            dict(stats.as_dict()),
+            {
+                "steps": 7,
+                "beta_steps": 2,
+                "lookups": 2,
+                "chain_walk": 2,
+                "max_chain_walk": 1,
+                "suspensions": 5,
+                "max_to_do": 2,
+                "max_results": 2,
+            },
+        )
+
+    def test_reduce_stats_lazy_sharing(self):
+        env = environment()
+        for text in [
+            r"two f x = f(f x)",
+            r"add m n = \f x.m f(n f x)",
+            r"dup n = add n n",
+        ]:
+            name, body = definition(text, env)
+            env = env.append(name, Suspension(body, env))
+        term = expr("dup (dup (dup (dup two)))", env)
+
+        eager_stats, lazy_stats = ReductionStats(), ReductionStats()
+        self.assertEqual(
+            reduce(term, env, stats=eager_stats),
+            reduce(term, env, lazy=True, stats=lazy_stats),
+        )
+        self.assertLess(lazy_stats.beta_steps, eager_stats.beta_steps)
+
+    def test_reduce_fuel_and_resume(self):
+        two = expr(r"\f x.f(f x)")
+        pow = expr(r"\m n.n m")
+        term = pow @ two @ (pow @ two @ two)
+        expected = reduce(term)
+
+        with self.assertRaises(ReductionInterrupted) as cm:
+            reduce(term, fuel=100)
+        reduction = cm.exception.reduction
+        self.assertEqual(reduction.stop_reason, FUEL_EXHAUSTED)
+        self.assertEqual(reduction.steps, 100)
+        self.assertFalse(reduction.done)
+        with self.assertRaises(ValueError):
+            reduction.result()
+
+        # Resume in small increments until done.
+        while not reduction.run(fuel=37):
+            self.assertEqual(reduction.steps % 37, 100 % 37)
+        self.assertTrue(reduction.done)
+        self.assertEqual(reduction.result(), expected)
+        self.assertIsNone(reduction.stop_reason)
+
+        # Total steps match an uninterrupted reduction.
+        uninterrupted = Reduction(term)
+        self.assertTrue(uninterrupted.run())
+        self.assertEqual(uninterrupted.steps, reduction.steps)
+
+    def test_reduce_timeout(self):
+        omega = expr(r"(\x.x x)(\x.x x)")
+        with self.assertRaises(ReductionInterrupted) as cm:
+            reduce(omega, timeout=0.05)
+        reduction = cm.exception.reduction
+        self.assertEqual(reduction.stop_reason, TIMED_OUT)
+        self.assertFalse(reduction.run(fuel=10))
+        self.assertEqual(reduction.stop_reason, FUEL_EXHAUSTED)
+
+    @unittest.skipUnless(os.name == "posix", "requires POSIX signals")
+    def test_reduce_keyboard_interrupt(self):
+        omega = expr(r"(\x.x x)(\x.x x)")
+        timer = threading.Timer(0.05, os.kill, (os.getpid(), signal.SIGINT))
+        timer.start()
+        try:
+            with self.assertRaises(ReductionInterrupted) as cm:
+                reduce(omega, interruptible=True, timeout=10.0)
+        finally:
+            timer.join()
+        self.assertEqual(cm.exception.reduction.stop_reason, INTERRUPTED)
+
+    def test_reduce_hash_consing(self):
+        term = expr(r"\g.(\y.\f.f y y)(g g)")
+        builder = HashConsingBuilder()
+        result = reduce(term, builder=builder)
+        self.assertEqual(result, reduce(term))
+
+        body = result.body.body
+        self.assertIs(body.function.argument, body.argument)
+
+    def test_normal_form_cache(self):
+        cache = NormalFormCache(maxsize=2)
+        env = environment()
+        for source in [
+            r"two f x = f(f x)",
+            r"mul m n f = m(n f)",
+        ]:
+            name, body = definition(source, env)
+            env = env.append(name, Suspension(body, env))
+
+        four = expr("mul two two", env)
+        result = cache.reduce(four, env)
+        self.assertEqual(result, expr(r"\f x.f(f(f(f x)))"))
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+        # Alpha-equivalent terms share an entry.
+        self.assertIs(cache.reduce(expr("mul two two", env), env), result)
+        self.assertIs(cache.get(expr(r"(\a.a)(mul two two)", env)), None)
+        self.assertIs(cache.get(expr(r"(\b.b)(mul two two)", env)), None)
+        cache.put(expr(r"(\a.a)(mul two two)", env), result)
+        self.assertIs(cache.get(expr(r"(\b.b)(mul two two)", env)), result)
+        self.assertEqual((cache.hits, cache.misses), (2, 3))
+
+        # Least recently used entries are evicted first.
+        cache.get(four)
+        cache.reduce(expr("two two", env), env)
+        self.assertEqual(len(cache), 2)
+        self.assertIs(cache.get(four), result)
+        self.assertIs(cache.get(expr(r"(\a.a)(mul two two)", env)), None)
+
+        cache.resize(1)
+        self.assertEqual(len(cache), 1)
+        self.assertIs(cache.get(four), result)
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual((cache.hits, cache.misses), (0, 0))
+
+        cache.resize(0)
+        cache.reduce(four, env)
+        self.assertEqual(len(cache), 0)
@@ -1,3 +1,4 @@
+import gc
 import unittest
 
 from church.environment import (
@@ -7,6 +8,7 @@ from church.expr import (
     ApplyExpr,
     expr,
     FunctionExpr,
+    HashConsingBuilder,
     NameExpr,
     Parameter,
     unexpr,
@@ -93,3 +95,74 @@ class TestExpr(unittest.TestCase):
                 actual_expr = expr(input)
                 actual_bitstring = actual_expr.bitstring()
                 self.assertEqual(actual_bitstring, expected_bitstring)
+
+    def test_hash_consing(self):
+        builder = HashConsingBuilder()
+        x, y = Parameter("x"), Parameter("y")
+
+        self.assertIs(builder.name(x), builder.name(x))
+        self.assertIsNot(builder.name(x), builder.name(y))
+        xy = builder.apply(builder.name(x), builder.name(y))
+        self.assertIs(xy, builder.apply(builder.name(x), builder.name(y)))
+        self.assertIs(builder.function(x, xy), builder.function(x, xy))
+        self.assertIsNot(builder.function(x, xy), builder.function(y, xy))
+
+        term = expr(r"\f x.(f x)(f x)(\y.f x)", builder=builder)
+        body = term.body.body
+        self.assertIs(body.function.function, body.function.argument)
+        self.assertIs(body.function.argument, body.argument.body)
+        self.assertEqual(term, expr(r"\f x.(f x)(f x)(\y.f x)"))
+
+    def test_hash_consing_table_is_weak(self):
+        builder = HashConsingBuilder()
+        term = expr(r"\f x.f(f(f(f x)))", builder=builder)
+        self.assertEqual(len(builder), 8)
+        del term
+        gc.collect()
+        self.assertEqual(len(builder), 0)
+
+    def test_alpha_equivalent_hashing(self):
+        alpha_equivalent = [
+            (r"\x.x", r"\dummy.dummy"),
+            (r"\x x.x", r"\x y.y"),
+            (r"\x y x y.x y", r"\a b c d.c d"),
+            (r"\f x.f(f x)", r"\g y.g(g y)"),
+        ]
+        for first, second in alpha_equivalent:
+            with self.subTest(first=first, second=second):
+                self.assertEqual(hash(expr(first)), hash(expr(second)))
+
+        terms = [expr(first) for first, _ in alpha_equivalent]
+        lookup = {term: index for index, term in enumerate(terms)}
+        for index, (_, second) in enumerate(alpha_equivalent):
+            self.assertEqual(lookup[expr(second)], index)
+        self.assertEqual(
+            len({expr(text) for pair in alpha_equivalent for text in pair}),
+            len(alpha_equivalent),
+        )
+
+    def test_equality_with_free_and_shadowed_names(self):
+        X, Y = Parameter("x"), Parameter("y")
+        free_x, free_y = NameExpr(X), NameExpr(Y)
+        self.assertEqual(free_x, NameExpr(X))
+        self.assertEqual(hash(free_x), hash(NameExpr(X)))
+        self.assertNotEqual(free_x, free_y)
+
+        # The same Parameter bound twice, as built by hand.
+        shadowed = FunctionExpr(X, FunctionExpr(X, NameExpr(X)))
+        self.assertEqual(shadowed, expr(r"\a b.b"))
+        self.assertEqual(hash(shadowed), hash(expr(r"\a b.b")))
+        self.assertNotEqual(
+            FunctionExpr(Y, free_x), FunctionExpr(Y, free_y))
+        self.assertNotEqual(free_x, "x")
+
+    def test_equality_of_large_terms(self):
+        # Neither equality nor hashing should recurse.
+        X = Parameter("x")
+        body = NameExpr(X)
+        for _ in range(100000):
+            body = ApplyExpr(body, NameExpr(X))
+        first, second = FunctionExpr(X, body), FunctionExpr(X, body)
+        self.assertEqual(first, second)
+        self.assertEqual(hash(first), hash(second))
+        self.assertNotEqual(first, body)
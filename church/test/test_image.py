@@ -0,0 +1,103 @@
+import io
+import unittest
+
+from church.environment import environment, indexed_environment
+from church.eval import reduce, Suspension
+from church.expr import definition, expr, NameExpr, Parameter, unexpr
+from church.image import (
+    dump_image,
+    dumps_image,
+    ImageError,
+    load_image,
+    loads_image,
+)
+
+DEFINITIONS = [
+    r"two f x = f(f x)",
+    r"add m n = \f x.m f(n f x)",
+    r"four = add two two",
+    r"two f x = f(f(f x))",  # shadows the first two
+    r"six = add two two",
+    r"Μῆνιν = four",
+]
+
+
+def session(env, slots):
+    for text in DEFINITIONS:
+        name, body = definition(text, env, slots=slots)
+        env = env.append(name, Suspension(body, env))
+    return env
+
+
+class TestImage(unittest.TestCase):
+    def check_roundtrip(self, env, slots):
+        loaded = loads_image(dumps_image(env))
+        self.assertEqual(type(loaded), type(env))
+        self.assertEqual(loaded.depth, env.depth)
+        self.assertEqual(
+            [var.name for var, _ in loaded],
+            [var.name for var, _ in env],
+        )
+        for (_, original), (_, copy) in zip(env, loaded):
+            self.assertEqual(
+                unexpr(copy.term, {var: var.name for var, _ in copy.env}),
+                unexpr(
+                    original.term,
+                    {var: var.name for var, _ in original.env},
+                ),
+            )
+
+        for name in ["four", "six", "Μῆνιν"]:
+            with self.subTest(name=name):
+                term = expr(name, env, slots=slots)
+                loaded_term = expr(name, loaded, slots=slots)
+                self.assertEqual(
+                    reduce(loaded_term, loaded), reduce(term, env))
+        return loaded
+
+    def test_roundtrip_linked_environment(self):
+        self.check_roundtrip(session(environment(), False), False)
+
+    def test_roundtrip_indexed_environment(self):
+        loaded = self.check_roundtrip(
+            session(indexed_environment(), True), True)
+
+        # Parameter identities are shared between the environment and
+        # the terms referring to it: 'six' refers to the second 'two'.
+        bindings = list(loaded)
+        (two, _), (add, _) = bindings[2], bindings[4]
+        six_term = bindings[1][1].term
+        self.assertIs(six_term.argument.parameter, two)
+        self.assertIs(six_term.function.function.parameter, add)
+        self.assertEqual(six_term.argument.slot, 3)
+
+    def test_roundtrip_frames(self):
+        x, y = Parameter("x"), Parameter("y")
+        env = session(indexed_environment(), True)
+        env = env.extend(x, NameExpr(x, 6)).extend(
+            y, Suspension(expr("add", env, slots=True), env))
+        loaded = loads_image(dumps_image(env))
+        self.assertEqual(type(loaded).__name__, "SlotEnvironment")
+        self.assertEqual(loaded.env.val.slot, 6)
+        self.assertIs(loaded.env.val.parameter, loaded.env.var)
+
+    def test_file_objects(self):
+        env = session(indexed_environment(), True)
+        image_file = io.BytesIO()
+        dump_image(env, image_file)
+        image_file.seek(0)
+        loaded = load_image(image_file)
+        self.assertEqual(loaded.depth, env.depth)
+
+    def test_invalid_images(self):
+        data = dumps_image(session(indexed_environment(), True))
+        bad_images = [
+            b"",
+            b"NOTANIMAGE" + data[10:],
+            data[:len(data) // 2],
+            data[:8] + b"\x63" + data[9:],
+        ]
+        for bad in bad_images:
+            with self.subTest(bad=bad[:12]):
+                with self.assertRaises(ImageError):
+                    loads_image(bad)
@@ -0,0 +1,123 @@
+import unittest
+
+from church.eval import reduce, ReductionStats
+from church.expr import ConstantExpr, expr, unexpr
+from church.native import church_term, NATIVES, PRIMITIVES, readback
+
+
+def native_expr(source):
+    return expr(source, natives=NATIVES)
+
+
+class TestNative(unittest.TestCase):
+    def test_natives(self):
+        self.assertEqual(NATIVES.get("0"), 0)
+        self.assertEqual(NATIVES.get("123"), 123)
+        self.assertIs(NATIVES.get("true"), True)
+        self.assertIs(NATIVES.get("false"), False)
+        self.assertIs(NATIVES.get("add"), PRIMITIVES["add"])
+        self.assertIsNone(NATIVES.get("x1"))
+        self.assertIsNone(NATIVES.get("\N{SUPERSCRIPT TWO}"))
+
+    def test_bind_natives(self):
+        term = native_expr(r"\x.add x 10")
+        self.assertEqual(type(term.body.argument), ConstantExpr)
+        self.assertEqual(term.body.argument.value, 10)
+        self.assertEqual(unexpr(term), r"\x.add x 10")
+
+        # Bound names take precedence.
+        term = native_expr(r"\add.add 1")
+        self.assertNotEqual(type(term.body.function), ConstantExpr)
+
+    def test_constant_equality(self):
+        self.assertEqual(native_expr("1"), native_expr("1"))
+        self.assertNotEqual(native_expr("1"), native_expr("true"))
+        self.assertNotEqual(native_expr("0"), native_expr("false"))
+        self.assertEqual(
+            hash(native_expr("add 2")), hash(native_expr("add 2")))
+        with self.assertRaises(ValueError):
+            native_expr("1").bitstring()
+
+    def test_delta_rules(self):
+        test_pairs = [
+            ("add 2 3", "5"),
+            ("mul 6 7", "42"),
+            ("pow 10 3", "1000"),
+            ("pow 2 100", str(2**100)),
+            ("pred 5", "4"),
+            ("pred 0", "0"),
+            ("iszero 0", "true"),
+            ("iszero (pred 2)", "false"),
+            ("add (mul 2 3) (pow 2 (add 1 1))", "10"),
+        ]
+        for source, expected in test_pairs:
+            for lazy in [False, True]:
+                with self.subTest(source=source, lazy=lazy):
+                    result = reduce(native_expr(source), lazy=lazy)
+                    self.assertEqual(type(result), ConstantExpr)
+                    self.assertEqual(unexpr(result), expected)
+
+    def test_delta_rules_are_fast(self):
+        stats = ReductionStats()
+        reduce(native_expr("pow 10 (mul 25 4)"), stats=stats)
+        self.assertLess(stats.steps, 50)
+
+    def test_church_fallback(self):
+        # Native constants act like their Church encodings.
+        test_pairs = [
+            (r"3 (\x.x)", r"\x.x"),
+            (r"2 2", r"\f x.f(f(f(f x)))"),
+            (r"true 1 2", "1"),
+            (r"iszero 0 1 2", "1"),
+            (r"add (\f x.f x) 2", r"\f x.f(f(f x))"),
+            (r"pred (\f x.f(f x))", r"\f x.f x"),
+            (r"\x.add x 1", r"\x f x0.x f(f x0)"),
+            (r"(\c n.c 1(c 2(c 3 n))) add 0", "6"),
+            (r"add 2", "add 2"),
+            (r"\x.mul x", r"\x.mul x"),
+        ]
+        for source, expected in test_pairs:
+            for lazy in [False, True]:
+                with self.subTest(source=source, lazy=lazy):
+                    result = reduce(native_expr(source), lazy=lazy)
+                    self.assertEqual(result, native_expr(expected))
+
+    def test_church_term(self):
+        self.assertEqual(church_term(0), expr(r"\f x.x"))
+        self.assertEqual(church_term(3), expr(r"\f x.f(f(f x))"))
+        self.assertEqual(church_term(True), expr(r"\x y.x"))
+        self.assertEqual(church_term(False), expr(r"\x y.y"))
+
+    def test_readback(self):
+        test_pairs = [
+            (r"\f x.x", "0"),
+            (r"\f x.f(f(f x))", "3"),
+            (r"\x y.x", "true"),
+            (r"\x y.y", "0"),
+            (r"\f.f (\x y.x) (\f x.f x)", "(true, 1)"),
+            (r"\c n.c (\f x.x) (c (\f x.f x) n)", "[0, 1]"),
+            (r"\c n.c (\f.f (\f x.f x) (\x.x)) n", r"[(1, \x.x)]"),
+            (r"\f.f f f", r"\f.f f f"),
+            (r"\c n.c (\x.n) n", r"\c n.c(\x.n)n"),
+            (r"\x.x", r"\x.x"),
+            ("32", "32"),
+            ("false", "false"),
+        ]
+        for source, expected in test_pairs:
+            with self.subTest(source=source):
+                self.assertEqual(readback(native_expr(source)), expected)
+
+        self.assertEqual(readback(reduce(native_expr(r"""
+            (\p q f.f p q) (mul 3 4) (iszero 1)
+        """))), "(12, false)")
+
+    def test_readback_deeply_nested(self):
+        source = r"\c n." + "c 1(" * 5000 + "n" + ")" * 5000
+        self.assertEqual(
+            readback(native_expr(source)),
+            "[" + ", ".join(["1"] * 5000) + "]",
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
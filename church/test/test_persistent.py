@@ -0,0 +1,86 @@
+import unittest
+
+from church.persistent import PersistentMap, PersistentVector
+
+
+class CollidingKey:
+    """
+    Key type whose instances all share the same hash.
+    """
+    def __init__(self, label):
+        self.label = label
+
+    def __hash__(self):
+        return 1729
+
+    def __eq__(self, other):
+        return type(other) == CollidingKey and self.label == other.label
+
+
+class TestPersistentMap(unittest.TestCase):
+    def test_empty(self):
+        empty = PersistentMap()
+        self.assertEqual(len(empty), 0)
+        self.assertNotIn("x", empty)
+        self.assertIsNone(empty.get("x"))
+        with self.assertRaises(KeyError):
+            empty["x"]
+
+    def test_set_and_get(self):
+        mapping = PersistentMap()
+        for i in range(2000):
+            mapping = mapping.set(i, str(i))
+        self.assertEqual(len(mapping), 2000)
+        for i in range(2000):
+            self.assertEqual(mapping[i], str(i))
+        self.assertNotIn(2000, mapping)
+        self.assertEqual(mapping.get(-1, "missing"), "missing")
+
+    def test_persistence(self):
+        first = PersistentMap().set("x", 1)
+        second = first.set("x", 2)
+        third = second.set("y", 3)
+        self.assertEqual(first["x"], 1)
+        self.assertNotIn("y", first)
+        self.assertEqual(second["x"], 2)
+        self.assertEqual(len(second), 1)
+        self.assertEqual(third["x"], 2)
+        self.assertEqual(third["y"], 3)
+        self.assertEqual(len(third), 2)
+
+    def test_hash_collisions(self):
+        keys = [CollidingKey(label) for label in "abcde"]
+        mapping = PersistentMap()
+        for index, key in enumerate(keys):
+            mapping = mapping.set(key, index)
+        mapping = mapping.set(CollidingKey("c"), 42)
+        self.assertEqual(len(mapping), 5)
+        self.assertEqual(mapping[CollidingKey("a")], 0)
+        self.assertEqual(mapping[CollidingKey("c")], 42)
+        self.assertEqual(mapping[CollidingKey("e")], 4)
+        self.assertNotIn(CollidingKey("f"), mapping)
+
+
+class TestPersistentVector(unittest.TestCase):
+    def test_append_and_index(self):
+        vector = PersistentVector()
+        snapshots = {}
+        for i in range(40000):
+            vector = vector.append(i)
+            if i in {0, 31, 32, 1023, 1024, 1056, 32799, 32800}:
+                snapshots[i + 1] = vector
+
+        self.assertEqual(len(vector), 40000)
+        self.assertEqual([vector[i] for i in range(40000)], list(range(40000)))
+        for size, snapshot in snapshots.items():
+            with self.subTest(size=size):
+                self.assertEqual(len(snapshot), size)
+                self.assertEqual(
+                    [snapshot[i] for i in range(size)], list(range(size)))
+
+    def test_index_out_of_range(self):
+        vector = PersistentVector().append("a")
+        with self.assertRaises(IndexError):
+            vector[1]
+        with self.assertRaises(IndexError):
+            vector[-1]